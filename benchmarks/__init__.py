@@ -0,0 +1,47 @@
+'''
+Benchmarks for RoverPylot's hot paths.  Run all of them with
+
+    python -m benchmarks [-o results.json] [benchmark ...]
+
+which writes the results as JSON for comparison across runs.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as 
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import time
+
+# Best of this many trials is reported
+TRIALS = 5
+
+def besttime(func, *args):
+    ''' Returns the shortest time in seconds taken by func(*args) over TRIALS 
+        calls.
+    '''
+    best = None
+    for _ in range(TRIALS):
+        start = time.time()
+        func(*args)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def result(name, value, unit):
+    ''' Returns a benchmark result as a dictionary.
+    '''
+    return {'name': name, 'value': value, 'unit': unit}
+
+def report(results):
+    ''' Prints benchmark results in human-readable form.
+    '''
+    for r in results:
+        print('%-36s %12.3f %s' % (r['name'], r['value'], r['unit']))
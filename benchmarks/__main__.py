@@ -0,0 +1,60 @@
+'''
+Runs RoverPylot benchmarks and writes their results as JSON.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as 
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from . import adpcmbench, blowfishbench, demuxbench, framebench, report
+
+BENCHMARKS = {
+    'adpcm'    : adpcmbench,
+    'blowfish' : blowfishbench,
+    'demux'    : demuxbench,
+    'frames'   : framebench,
+    }
+
+parser = argparse.ArgumentParser(description='Run RoverPylot benchmarks.')
+parser.add_argument('names', nargs='*', 
+                    help='benchmarks to run: %s (default: all)' % ', '.join(sorted(BENCHMARKS)))
+parser.add_argument('-o', '--output', help='JSON file for results (default: stdout)')
+args = parser.parse_args()
+
+for name in args.names:
+    if name not in BENCHMARKS:
+        parser.error('unknown benchmark %s' % name)
+
+results = []
+for name in args.names or sorted(BENCHMARKS):
+    results += BENCHMARKS[name].run()
+
+run = {
+    'time'     : time.strftime('%Y-%m-%dT%H:%M:%S'),
+    'python'   : platform.python_version(),
+    'platform' : platform.platform(),
+    'machine'  : platform.machine(),
+    'results'  : results,
+    }
+
+if args.output:
+    with open(args.output, 'w') as f:
+        json.dump(run, f, indent=2, sort_keys=True)
+    report(results)
+else:
+    json.dump(run, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
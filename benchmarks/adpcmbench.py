@@ -0,0 +1,42 @@
+'''
+adpcmbench.py ADPCM decoding throughput on Rover 2.0-sized audio blocks.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as 
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+# 320 samples per block, as streamed by the Rover 2.0
+BLOCK_SIZE = 160
+
+# Blocks decoded per trial
+BLOCKS = 500
+
+from rover.adpcm import decodeADPCMToPCM
+
+from . import besttime, result, report
+
+import os
+
+def decode(blocks):
+    for raw in blocks:
+        decodeADPCMToPCM(raw, 0, 0)
+
+def run():
+
+    blocks = [os.urandom(BLOCK_SIZE) for _ in range(BLOCKS)]
+
+    elapsed = besttime(decode, blocks)
+
+    return [result('adpcm.decode', 2 * BLOCK_SIZE * BLOCKS / elapsed, 'samples/s')]
+
+if __name__ == '__main__':
+    report(run())
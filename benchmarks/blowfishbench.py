@@ -0,0 +1,58 @@
+'''
+blowfishbench.py Blowfish key setup time, and throughput of per-pair encrypt() 
+calls compared with the bulk encryptECB() method.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as 
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+# Bytes encrypted per trial
+DATA_SIZE = 64 * 1024
+
+KEY = 'AC13:0123456789AB-save-private:AC13'
+
+from rover import blowfish
+from rover.blowfish import RoverBlowfish
+
+from . import besttime, result, report
+
+import os
+import struct
+
+def perpair(bf, data):
+    words = struct.unpack('>%dI' % (len(data)//4), data)
+    out = []
+    for k in range(0, len(words), 2):
+        out.extend(bf.encrypt(words[k], words[k+1]))
+    return struct.pack('>%dI' % len(out), *out)
+
+def bulk(bf, data):
+    return bf.encryptECB(data)
+
+def keysetup():
+    blowfish._keyCache.clear()
+    RoverBlowfish(KEY)
+
+def run():
+
+    bf = RoverBlowfish(KEY)
+    data = os.urandom(DATA_SIZE)
+
+    assert perpair(bf, data) == bulk(bf, data)
+
+    return [result('blowfish.keysetup', 1000 * besttime(keysetup), 'msec'),
+            result('blowfish.keysetup.cached', 1000 * besttime(RoverBlowfish, KEY), 'msec'),
+            result('blowfish.encrypt.perpair', DATA_SIZE / besttime(perpair, bf, data) / 1e6, 'MB/s'),
+            result('blowfish.encrypt.ecb', DATA_SIZE / besttime(bulk, bf, data) / 1e6, 'MB/s')]
+
+if __name__ == '__main__':
+    report(run())
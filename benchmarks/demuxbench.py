@@ -0,0 +1,65 @@
+'''
+demuxbench.py Media demultiplexing throughput on a synthetic MO_V stream.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as 
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+# Video frames in the stream, each followed by an audio block
+FRAMES = 200
+
+# Bytes per video frame
+FRAME_SIZE = 30000
+
+# Bytes per read from the stream
+CHUNK_SIZE = 4096
+
+from rover.commands import makeRequest
+from rover.demux import Demuxer, VIDEO, AUDIO
+
+from . import besttime, result, report
+
+import os
+import struct
+
+def makestream():
+    jpeg = os.urandom(FRAME_SIZE)
+    adpcm = os.urandom(160)
+    messages = []
+    for k in range(FRAMES):
+        video = struct.pack('<II', k, k) + b'\0' + struct.pack('<I', len(jpeg)) + jpeg
+        audio = struct.pack('<III', k, k, 0) + b'\0' + struct.pack('<I', len(adpcm)) + adpcm + b'\0\0\0'
+        messages.append(makeRequest('V', VIDEO, len(video), video))
+        messages.append(makeRequest('V', AUDIO, len(audio), audio))
+    return b''.join(messages)
+
+def demux(chunks):
+    d = Demuxer()
+    count = 0
+    for chunk in chunks:
+        d.feed(chunk)
+        for _ in d:
+            count += 1
+    assert count == 2 * FRAMES
+
+def run():
+
+    stream = makestream()
+    chunks = [stream[k:k+CHUNK_SIZE] for k in range(0, len(stream), CHUNK_SIZE)]
+
+    elapsed = besttime(demux, chunks)
+
+    return [result('demux.throughput', len(stream) / elapsed / 1e6, 'MB/s'),
+            result('demux.frames', 2 * FRAMES / elapsed, 'frames/s')]
+
+if __name__ == '__main__':
+    report(run())
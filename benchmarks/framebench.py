@@ -0,0 +1,91 @@
+'''
+framebench.py End-to-end frame rate and per-frame latency from a local 
+RoverEmulator into Rover20.processVideo() and processAudio().
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as 
+published by the Free Software Foundation, either version 3 of the 
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+# Seconds of streaming per measurement
+DURATION_SEC = 3.0
+
+# Bytes per video frame
+FRAME_SIZE = 30000
+
+# Paced frame rate for latency measurement
+FRAMERATE = 15
+
+from rover import Rover20
+from rover.emulator import RoverEmulator
+
+from . import result, report
+
+import time
+
+class _TimingRover(Rover20):
+
+    def __init__(self, host, port):
+        self.videoTimes = []
+        self.audioTimes = []
+        Rover20.__init__(self, host, port)
+
+    def processVideo(self, jpegbytes, timestamp_10msec):
+        self.videoTimes.append((time.time(), timestamp_10msec))
+
+    def processAudio(self, pcmsamples, timestamp_10msec):
+        self.audioTimes.append((time.time(), timestamp_10msec))
+
+def stream(realtime):
+
+    emulator = RoverEmulator(framerate=FRAMERATE, framesize=FRAME_SIZE, realtime=realtime)
+    emulator.start()
+
+    rover = _TimingRover('127.0.0.1', emulator.PORT)
+    time.sleep(DURATION_SEC)
+    rover.close()
+    emulator.close()
+
+    return rover, emulator
+
+def run():
+
+    # Unpaced: as many frames as the client can take
+    rover, _ = stream(False)
+    frames = len(rover.videoTimes)
+    elapsed = rover.videoTimes[-1][0] - rover.videoTimes[0][0]
+
+    results = [result('e2e.video.unpaced', (frames - 1) / elapsed, 'frames/s'),
+               result('e2e.video.unpaced.throughput', frames * FRAME_SIZE / elapsed / 1e6, 'MB/s'),
+               result('e2e.audio.unpaced', len(rover.audioTimes) / elapsed, 'blocks/s')]
+
+    # Paced: latency from each frame's send time, looked up by its timestamp
+    # (so that frames dropped by the video queue don't skew later ones), to
+    # its callback
+    rover, emulator = stream(True)
+    results += _latencies('e2e.video.latency', rover.videoTimes, emulator.videoSendTimes)
+    results += _latencies('e2e.audio.latency', rover.audioTimes, emulator.audioSendTimes)
+
+    return results
+
+# Median, 95th percentile, and maximum latencies, in msec, of (arrival time,
+# timestamp) pairs, given the send time for each timestamp
+def _latencies(name, times, sendTimes):
+
+    latencies = sorted(1000 * (arrival - sendTimes[timestamp])
+                       for arrival, timestamp in times if timestamp in sendTimes)
+
+    return [result(name + '.median', latencies[len(latencies)//2], 'msec'),
+            result(name + '.p95', latencies[int(0.95 * (len(latencies)-1))], 'msec'),
+            result(name + '.max', latencies[-1], 'msec')]
+
+if __name__ == '__main__':
+    report(run())
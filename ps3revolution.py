@@ -21,6 +21,8 @@ BUTTON_STEALTH     = 1  # Circle button toggles stealth mode
 BUTTON_TURRET      = 3  # Square button toggles turret camera
 AXIS_PAN_HORZ      = 0  # Left joystick controls turret pan
 AXIS_PAN_VERT      = 1  #  and tilt
+AXIS_STEER         = 2  # Right joystick steers
+AXIS_DRIVE         = 3  #  and drives
 
 # Avoid button bounce by enforcing lag between button events
 MIN_BUTTON_LAG_SEC = 0.5
@@ -33,17 +35,13 @@ SPEED_THRESH       = 0.5
 
 # For FFPLAY 
 FRAMERATE          = 20
-DELAY_SEC          = 2.5
 
 from rover import Revolution
+from rover.joystick import JoystickInput, direction
+from rover.sinks import StreamSink
 
-import time
-import pygame
 import sys
 import signal
-import subprocess
-import tempfile
-import os
 
 # Supports CTRL-C to override threads
 def _signal_handler(signal, frame):
@@ -53,116 +51,67 @@ def _signal_handler(signal, frame):
 # Rover subclass for PS3 + OpenCV
 class PS3Rover(Revolution):
 
-    def __init__(self, tmpfile):
+    def __init__(self, sink):
+
+        # Streams video to player; set up before Rover starts streaming
+        self.sink = sink
 
         # Set up basics
         Revolution.__init__(self)
         self.wname = 'Rover Revolution'
 
-        # Set up controller using PyGame
-        pygame.display.init()
-        pygame.joystick.init()
-        self.controller = pygame.joystick.Joystick(0)
-        self.controller.init()
-
-         # Defaults on startup: no stealth; driving camera
-        self.stealthIsOn = False
-        self.usingTurret = False
-
-        # Tracks button-press times for debouncing
-        self.lastButtonTime = 0
-
-        # Saves data to video file for display
-        self.tmpfile = tmpfile
+        # Set up controller using PyGame, acting on its events as they arrive:
+        # no stealth, driving camera on startup
+        self.controller = JoystickInput(0, MIN_AXIS_ABSVAL, MIN_BUTTON_LAG_SEC)
+        self.controller.mapToggle(BUTTON_STEALTH, self.turnStealthOn, self.turnStealthOff)
+        self.controller.mapToggle(BUTTON_TURRET, self.useTurretCamera, self.useDrivingCamera)
 
-    # Automagically called by Rover class
-    def processVideo(self, h264bytes, timestamp_msec):
+        # Use right joystick to drive
+        self.controller.mapAxes((AXIS_STEER, AXIS_DRIVE), self.steer)
 
-        # Update controller events
-        pygame.event.pump()    
+        # Use left joystick to control turret camera
+        self.controller.mapAxes((AXIS_PAN_HORZ,), self.moveCameraHorizontal,
+                                lambda value: -direction(value))
+        self.controller.mapAxes((AXIS_PAN_VERT,), self.moveCameraVertical,
+                                lambda value: -direction(value))
 
-        # Toggle stealth mode (lights off / infrared camera on)    
-        self.stealthIsOn = self.checkButton(self.stealthIsOn, BUTTON_STEALTH, self.turnStealthOn, self.turnStealthOff)   
+        self.controller.start()
 
-        # Toggle stealth mode (lights off / infrared camera on)    
-        self.usingTurret = self.checkButton(self.usingTurret, BUTTON_TURRET, self.useTurretCamera, self.useDrivingCamera)   
+    # Called by controller when right joystick moves
+    def steer(self, axis2, axis3):
 
-        # Use right joystick to drive
-        axis2 = self.get_axis(2)
-        axis3 = self.get_axis(3)
         goslow = False if abs(axis3) > SPEED_THRESH or abs(axis2) > SPEED_THRESH else True
-        wheeldir = -self.axis_to_dir(axis3)
-        steerdir = self.axis_to_dir(axis2)
-        self.drive(wheeldir, steerdir, goslow)
-
-        # Use left joystick to control turret camera
-        axis0 = self.axis_to_dir(self.get_axis(AXIS_PAN_HORZ))
-        self.moveCameraHorizontal(-axis0)
-        axis1 = self.axis_to_dir(self.get_axis(AXIS_PAN_VERT))
-        self.moveCameraVertical(-axis1)
+        self.drive(-direction(axis3), direction(axis2), goslow)
 
+    # Automagically called by Rover class
+    def processVideo(self, h264bytes, timestamp_msec):
 
         # Send video through pipe
-        self.tmpfile.write(h264bytes)
-
-    # Converts axis value to direction 
-    def axis_to_dir(self, axis):
-
-        d = 0
-
-        if axis > 0:
-            d = 1
-        elif axis < 0:
-            d = -1
-
-        return d
-
-    # Returns axis value when outside noise threshold, else 0
-    def get_axis(self, index):
-        
-        value = self.controller.get_axis(index)
-        
-        if value > MIN_AXIS_ABSVAL:
-            return value
-        elif value < -MIN_AXIS_ABSVAL:
-            return value
-        else:
-            return 0
-
-
-    # Handles button bounce by waiting a specified time between button presses   
-    def checkButton(self, flag, buttonID, onRoutine=None, offRoutine=None):
-        if self.controller.get_button(buttonID):
-            if (time.time() - self.lastButtonTime) > MIN_BUTTON_LAG_SEC:
-                self.lastButtonTime = time.time()
-                if flag:
-                    if offRoutine:
-                        offRoutine()
-                    flag = False
-                else:
-                    if onRoutine:
-                        onRoutine()
-                    flag = True
-        return flag
+        self.sink.write(h264bytes)
+
+    def close(self):
+
+        self.controller.close()
+        Revolution.close(self)
 
 # main -----------------------------------------------------------------------------------
 
 if __name__ == '__main__':
 
-    # Create a named temporary file for video stream
-    tmpfile = tempfile.NamedTemporaryFile()
+    # Start playing video as it arrives, piped straight to ffplay; wait for
+    # ffplay to catch up rather than dropping video, which would corrupt it
+    cmd = 'ffplay -loglevel quiet -window_title Rover_Revolution -framerate %d -f h264 -' % FRAMERATE
+    sink = StreamSink(cmd.split(), block=True)
 
     # Create a PS3 Rover object
-    rover = PS3Rover(tmpfile)
+    rover = PS3Rover(sink)
 
     # Set up signal handler for CTRL-C
     signal.signal(signal.SIGINT, _signal_handler)
 
-    # Wait a few seconds, then being playing the tmp video file
-    time.sleep(DELAY_SEC)
-    cmd = 'ffplay -window_title Rover_Revolution -framerate %d %s' % (FRAMERATE, tmpfile.name)
-    FNULL = open(os.devnull, 'w')
-    subprocess.call(cmd.split(),  stdout=FNULL, stderr=subprocess.STDOUT)
+    # Wait for user to close player
+    sink.process.wait()
 
     # Shut down Rover
     rover.close()
+    sink.close()
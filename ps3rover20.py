@@ -22,6 +22,8 @@ BUTTON_LIGHTS      = 3  # Square button toggles lights
 BUTTON_STEALTH     = 1  # Circle button toggles stealth mode
 BUTTON_CAMERA_UP   = 0  # Triangle button raises camera
 BUTTON_CAMERA_DOWN = 2  # X button lowers camera
+AXIS_LEFT_TREAD    = 1  # Left joystick drives left tread
+AXIS_RIGHT_TREAD   = 3  #  and right joystick right tread
 
 # Avoid button bounce by enforcing lag between button events
 MIN_BUTTON_LAG_SEC = 0.5
@@ -29,136 +31,89 @@ MIN_BUTTON_LAG_SEC = 0.5
 # Avoid close-to-zero values on axis
 MIN_AXIS_ABSVAL    = 0.01
 
+# How often to send tread speeds
+TREAD_RATE_HZ      = 20
+
 
 from rover import Rover20
+from rover.jpeg import JPEGDecoder, DECODER
+from rover.joystick import JoystickInput, direction
+from rover.sinks import AudioSink
 
 
-import time
-import pygame
 import sys
 import signal
                                    
 # Supports CTRL-C to override threads
 def _signal_handler(signal, frame):
-    frame.f_locals['rover'].close()
+    rover = frame.f_locals['rover']
+    rover.close()
+    rover.audiosink.close()
     sys.exit(0)
 
 # Try to start OpenCV for video
 try:
-    import cv
-except:
-    cv = None
+    import cv2
+except ImportError:
+    cv2 = None
 
 # Rover subclass for PS3 + OpenCV
 class PS3Rover(Rover20):
 
     def __init__(self):
 
+        # Decode video images in memory, keeping only the newest; set up before
+        # Rover starts streaming
+        self.decoder = JPEGDecoder() if cv2 and DECODER else None
+
+        # Save audio as WAV file
+        self.audiosink = AudioSink('rover20.wav')
+
         # Set up basics
         Rover20.__init__(self)
         self.wname = 'Rover 2.0: Hit ESC to quit'
         self.quit = False
 
-        # Set up controller using PyGame
-        pygame.display.init()
-        pygame.joystick.init()
-        self.controller = pygame.joystick.Joystick(0)
-        self.controller.init()
-
-         # Defaults on startup: lights off, ordinary camera
-        self.lightsAreOn = False
-        self.stealthIsOn = False
-
-        # Tracks button-press times for debouncing
-        self.lastButtonTime = 0
-
-        # Try to create OpenCV named window
-        try:
-            if cv:
-                cv.NamedWindow(self.wname, cv.CV_WINDOW_AUTOSIZE )
-            else:
-                pass
-        except:
-            pass
+        # Send each change of speed promptly
+        self.startTreadControl(TREAD_RATE_HZ)
 
-        self.pcmfile = open('rover20.pcm', 'w')
+        # Set up controller using PyGame, acting on its events as they arrive:
+        # lights off, ordinary camera on startup
+        self.controller = JoystickInput(0, MIN_AXIS_ABSVAL, MIN_BUTTON_LAG_SEC)
+        self.controller.mapToggle(BUTTON_LIGHTS, self.turnLightsOn, self.turnLightsOff)
+        self.controller.mapToggle(BUTTON_STEALTH, self.turnStealthOn, self.turnStealthOff)
+        self.controller.mapButtonPair(BUTTON_CAMERA_UP, BUTTON_CAMERA_DOWN, self.moveCameraVertical)
+        self.controller.mapAxes((AXIS_LEFT_TREAD, AXIS_RIGHT_TREAD), self.setTreads,
+                                lambda value: -direction(value))
+        self.controller.start()
 
     # Automagically called by Rover class
     def processAudio(self, pcmsamples, timestamp_10msec):
 
-        for samp in pcmsamples:
-            self.pcmfile.write('%d\n' % samp)
+        self.audiosink.write(pcmsamples)
 
     # Automagically called by Rover class
     def processVideo(self, jpegbytes, timestamp_10msec):
 
-        # Update controller events
-        pygame.event.pump()    
-
-        # Toggle lights    
-        self.lightsAreOn  = self.checkButton(self.lightsAreOn, BUTTON_LIGHTS, self.turnLightsOn, self.turnLightsOff)   
-            
-        # Toggle night vision (infrared camera)    
-        self.stealthIsOn = self.checkButton(self.stealthIsOn, BUTTON_STEALTH, self.turnStealthOn, self.turnStealthOff)   
-        # Move camera up/down    
-        if self.controller.get_button(BUTTON_CAMERA_UP):  
-            self.moveCameraVertical(1)
-        elif self.controller.get_button(BUTTON_CAMERA_DOWN): 
-            self.moveCameraVertical(-1)
-        else:
-            self.moveCameraVertical(0)
-            
-        # Set treads based on axes        
-        self.setTreads(self.axis(1), self.axis(3))
-
-        # Display video image if possible
-        try:
-            if cv:
-
-                # Save image to file on disk and load as OpenCV image
-                fname = 'tmp.jpg'
-                fd = open(fname, 'w')
-                fd.write(jpegbytes)
-                fd.close()
-                image = cv.LoadImage(fname)        
-
-                # Show image
-                cv.ShowImage(self.wname, image )
-                if cv.WaitKey(1) & 0xFF == 27: # ESC
-                    self.quit = True
-            else:
-                pass
-        except:
-            pass
-        
-        
-    # Converts Y coordinate of specified axis to +/-1 or 0
-    def axis(self, index):
-        
-        value = -self.controller.get_axis(index)
-        
-        if value > MIN_AXIS_ABSVAL:
-            return 1
-        elif value < -MIN_AXIS_ABSVAL:
-            return -1
-        else:
-            return 0
-
-
-    # Handles button bounce by waiting a specified time between button presses   
-    def checkButton(self, flag, buttonID, onRoutine=None, offRoutine=None):
-        if self.controller.get_button(buttonID):
-            if (time.time() - self.lastButtonTime) > MIN_BUTTON_LAG_SEC:
-                self.lastButtonTime = time.time()
-                if flag:
-                    if offRoutine:
-                        offRoutine()
-                    flag = False
-                else:
-                    if onRoutine:
-                        onRoutine()
-                    flag = True
-        return flag
+        # Decode video image for display if possible
+        if self.decoder:
+            self.decoder.put(jpegbytes, timestamp_10msec)
+
+    # Shows newest video image; call from main thread
+    def showVideo(self):
+
+        frame = self.decoder.getImage(0.1)
+        if frame:
+            image, timestamp = frame
+            cv2.imshow(self.wname, image)
+
+        if cv2.waitKey(1) & 0xFF == 27: # ESC
+            self.quit = True
+
+    def close(self):
+
+        self.controller.close()
+        Rover20.close(self)
         
 # main -----------------------------------------------------------------------------------
 
@@ -170,12 +125,17 @@ if __name__ == '__main__':
     # Set up signal handler for CTRL-C
     signal.signal(signal.SIGINT, _signal_handler)
 
-    # Loop until user hits quit button on controller
-    while not rover.quit:
-        pass
+    # Show video until user hits ESC; without video, wait until Rover closes,
+    # waking periodically so that CTRL-C is handled on Python 2
+    if rover.decoder:
+        while not rover.quit:
+            rover.showVideo()
+    else:
+        while not rover.waitClosed(1):
+            pass
 
     # Shut down Rover
     rover.close()
-
-
-
+    rover.audiosink.close()
+    if rover.decoder:
+        rover.decoder.close()
@@ -15,33 +15,78 @@ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 '''
 
-import struct
 import threading
 import socket
 import time
 
-from blowfish import Blowfish
-from adpcm import decodeADPCMToPCM
-from byteutils import *
+from .demux import Demuxer, decodeMediaFrame, VIDEO, AUDIO
+from .capture import CaptureWriter
+from .framequeue import FrameQueue, DROP_OLDEST, LATEST, BLOCK
+from .dispatch import FrameDispatcher
+from .commands import makeRequest, packInts, commandPacket
+from .commands import KEEPALIVE, BATTERY, LIGHTS_ON, LIGHTS_OFF, STEALTH_ON, STEALTH_OFF
+from .commands import USE_TURRET_CAMERA, USE_DRIVING_CAMERA
+from .commands import CAMERA_UP, CAMERA_STOP, CAMERA_DOWN
+from .commands import CAMERA_PAN_PLUS, CAMERA_PAN_STOP, CAMERA_PAN_MINUS
+from .replies import CommandReader, CommandFuture
+from .scheduler import sharedScheduler
+from .telemetry import Telemetry
+from .treads import TreadControlLoop
+from .byteutils import *
     
 class Rover:
 
-    def __init__(self):
-        ''' Creates a Rover object that you can communicate with. 
+    # Sizes and policies (see rover.framequeue) of the queues holding frames for
+    # processVideo() and processAudio(); override in a subclass to change them
+    VIDEO_QUEUE_SIZE = 1
+    VIDEO_QUEUE_POLICY = LATEST
+    AUDIO_QUEUE_SIZE = 64
+    AUDIO_QUEUE_POLICY = DROP_OLDEST
+
+    def __init__(self, host='192.168.1.100', port=80):
+        ''' Creates a Rover object that you can communicate with, at the 
+            specified host and port.
         '''
       
-        self.HOST = '192.168.1.100'
-        self.PORT = 80
-        
-        TARGET_ID = 'AC13'
-        TARGET_PASSWORD = 'AC13'      
+        self.HOST = host
+        self.PORT = port
         
         self.TREAD_DELAY_SEC = 1.0
         self.KEEPALIVE_PERIOD_SEC = 60
+        self.REPLY_TIMEOUT_SEC = 10
+       
+        # Set up vertical camera controller
+        self.cameraVertical = _RoverCamera(self, CAMERA_UP, CAMERA_STOP, CAMERA_DOWN)
+
+        # Records raw media when capturing
+        self.capture = None
+
+        # Runs video processing on a worker pool when set by dispatchVideo()
+        self.videoDispatcher = None
+
+        # Runs keep-alive messages and status polling for every Rover
+        self.scheduler = sharedScheduler()
+
+        # Polls status in the background once items are added
+        self.telemetry = Telemetry(self.scheduler)
+
+        # Notifies waiters as frames are processed and when Rover closes
+        self.cond = threading.Condition()
+        self.videoFrame = None
+        self.videoFrameCount = 0
+        self.audioWaiters = []
+        self.is_closed = False
+
+        # Log in and start streaming
+        self._connect()
         
+    def _connect(self):
                             
         # Create command socket connection to Rover      
         self.commandsock = self._newSocket()
+
+        # Serializes sending commands from different threads
+        self.sendLock = threading.RLock()
         
         # Send login request with four arbitrary numbers
         self._sendCommandIntRequest(0, [0, 0, 0, 0])
@@ -49,35 +94,17 @@ class Rover:
         # Get login reply
         reply = self._receiveCommandReply(82)
                 
-        # Extract Blowfish key from camera ID in reply
-        cameraID = reply[25:37].decode('utf-8')
-        key = TARGET_ID + ':' + cameraID + '-save-private:' + TARGET_PASSWORD
-        
-        # Extract Blowfish inputs from rest of reply
-        L1 = bytes_to_int(reply, 66)
-        R1 = bytes_to_int(reply, 70)
-        L2 = bytes_to_int(reply, 74)
-        R2 = bytes_to_int(reply, 78)
-        
-        # Make Blowfish cipher from key
-        bf = _RoverBlowfish(key)
-        
-        # Encrypt inputs from reply
-        L1,R1 = bf.encrypt(L1, R1)
-        L2,R2 = bf.encrypt(L2, R2)
-        
         # Send encrypted reply to Rover
-        self._sendCommandIntRequest(2, [L1, R1, L2, R2])     
+        self._sendCommandIntRequest(2, _loginResponse(reply))     
         
         # Ignore reply from Rover
         self._receiveCommandReply(26)
         
-        # Start timer task for keep-alive message every 60 seconds
-        self._startKeepaliveTask()
-        
-       
-        # Set up vertical camera controller
-        self.cameraVertical = _RoverCamera(self, 1)
+        # Send keep-alive message now and every 60 seconds
+        self._sendCommandPacket(KEEPALIVE)
+        self.keepaliveTask = self.scheduler.schedule(self._sendKeepalive,
+                                                     self.KEEPALIVE_PERIOD_SEC,
+                                                     self.KEEPALIVE_PERIOD_SEC)
                       
         # Send video-start request
         self._sendCommandIntRequest(4, [1])       
@@ -89,42 +116,101 @@ class Rover:
         self.mediasock = self._newSocket()
 
         # Send video-start request based on last four bytes of reply
-        self._sendRequest(self.mediasock, 'V', 0, 4, map(ord, reply[25:]))
+        self._sendRequest(self.mediasock, 'V', 0, 4, bytearray(reply[25:]))
         
         # Send audio-start request
         self._sendCommandByteRequest(8, [1])
         
         # Ignore audio-start reply
         self._receiveCommandReply(25)
+
+        # Read further replies on another thread, handing each to its requester
+        self.commandReader = CommandReader(self.commandsock)
         
+        # Process frames on their own threads, so that slow processing never
+        # stalls reading the media stream
+        self.videoQueue = FrameQueue(self.VIDEO_QUEUE_SIZE, self.VIDEO_QUEUE_POLICY)
+        self.audioQueue = FrameQueue(self.AUDIO_QUEUE_SIZE, self.AUDIO_QUEUE_POLICY)
+        self.delivery_threads = [_DeliveryThread(self, VIDEO, self.videoQueue),
+                                 _DeliveryThread(self, AUDIO, self.audioQueue)]
+        for thread in self.delivery_threads:
+            thread.start()
+
         # Receive images on another thread until closed
         self.is_active = True
         self.reader_thread = _MediaThread(self)
         self.reader_thread.start()
-            
         
     def close(self):
         ''' Closes off commuincation with Rover.
         '''
         
-        self.keepalive_timer.cancel()
+        self.scheduler.cancel(self.keepaliveTask)
+        self.telemetry.close()
+
+        self.stopCapture()
+
+        if self.videoDispatcher:
+            self.videoDispatcher.close()
         
         self.is_active = False
+        _shutdown(self.commandsock)
         self.commandsock.close()
+
+        self.videoQueue.close()
+        self.audioQueue.close()
         
         if self.mediasock:
+            _shutdown(self.mediasock)
             self.mediasock.close()
 
+        self._setClosed()
+
+    def waitForFrame(self, timeout=None):
+        ''' Waits up to timeout seconds (forever by default) for the next video
+            frame to be processed, and returns it as an (image bytes,
+            timestamp) pair.  Returns None on timeout or if Rover closes.
+        '''
+        with self.cond:
+            count = self.videoFrameCount
+            self._wait(lambda: self.videoFrameCount != count, timeout)
+            return self.videoFrame if self.videoFrameCount != count else None
+
+    def waitForAudioEvent(self, predicate, timeout=None):
+        ''' Waits up to timeout seconds (forever by default) for an audio block
+            for which predicate(pcmsamples, timestamp) returns True, checking
+            each block after processAudio() has seen it.  Returns the block as
+            a (PCM samples, timestamp) pair, or None on timeout or if Rover
+            closes.
+        '''
+        waiter = [predicate, None]
+
+        with self.cond:
+            self.audioWaiters.append(waiter)
+            try:
+                self._wait(lambda: waiter[1] is not None, timeout)
+            finally:
+                self.audioWaiters.remove(waiter)
+            return waiter[1]
+
+    def waitClosed(self, timeout=None):
+        ''' Waits up to timeout seconds (forever by default) for Rover to be
+            closed, or for its media stream to end.  Returns True if it has.
+        '''
+        with self.cond:
+            self._wait(lambda: self.is_closed, timeout)
+            return self.is_closed
+
     def turnStealthOn(self):    
         ''' Turns on stealth mode (infrared).
         '''
-        self._sendCameraRequest(94)  
+        self._sendCommandPacket(STEALTH_ON)
         
     
     def turnStealthOff(self):   
         ''' Turns off stealth mode (infrared).
         '''
-        self._sendCameraRequest(95)   
+        self._sendCommandPacket(STEALTH_OFF)
 
     def moveCameraVertical(self, where):
         ''' Moves the camera up or down, or stops moving it.  A nonzero value for the 
@@ -133,34 +219,123 @@ class Rover:
         '''
         self.cameraVertical.move(where)
 
-    def _startKeepaliveTask(self,):
-        self._sendCommandByteRequest(255)
-        self.keepalive_timer = \
-            threading.Timer(self.KEEPALIVE_PERIOD_SEC, self._startKeepaliveTask, [])
-        self.keepalive_timer.start()
+    def startCapture(self, filename):
+        ''' Starts recording the raw video and audio streams to the specified
+            capture file, which can be read with rover.capture.CaptureReader.
+            Frames are dropped from the capture if the disk falls behind; see
+            the CaptureWriter's dropped and error attributes.
+        '''
+        self.stopCapture()
+        self.capture = CaptureWriter(filename)
+
+    def stopCapture(self):
+        ''' Stops recording and finishes the capture file.
+        '''
+        capture, self.capture = self.capture, None
+        if capture:
+            capture.close()
+
+    def dispatchVideo(self, workers=4, processes=False, ordered=True, maxInFlight=None,
+                      function=None):
+        ''' Runs processVideo() on a pool of the specified number of worker
+            threads, so that several frames can be processed at once, and
+            passes each of its return values to processVideoResult().  With
+            processes=True, a pool of worker processes instead runs the
+            specified function, which is called like processVideo() and must
+            be picklable (e.g., defined at module level).  If ordered is True,
+            results are delivered in the order their frames arrived (i.e.,
+            by timestamp).  At most maxInFlight frames (default = twice the
+            number of workers) are processed at once; further frames are
+            handled by the video queue's policy.
+        '''
+        if processes and not function:
+            raise ValueError('A picklable function is required for worker processes')
+
+        if self.videoDispatcher:
+            self.videoDispatcher.close()
+
+        self.videoDispatcher = FrameDispatcher(function or self.processVideo,
+                                               self.processVideoResult, workers,
+                                               processes, ordered, maxInFlight)
+
+    def processVideoResult(self, result, timestamp_10msec):
+        ''' Processes the value returned by processVideo() for the frame with
+            the specified timestamp, when video processing has been dispatched
+            to workers by dispatchVideo().  Default method is a no-op;
+            subclass and override to do something interesting.
+        '''
+        pass
+
+    def _frameProcessed(self, msgid, frame):
+
+        # Wakes up waiters interested in the frame
+        with self.cond:
+
+            if msgid == VIDEO:
+                self.videoFrame = frame
+                self.videoFrameCount += 1
+                self.cond.notify_all()
+
+            else:
+                for waiter in self.audioWaiters:
+                    if waiter[1] is None and waiter[0](*frame):
+                        waiter[1] = frame
+                        self.cond.notify_all()
+
+    def _setClosed(self):
+        with self.cond:
+            self.is_closed = True
+            self.cond.notify_all()
+
+    def _wait(self, condition, timeout):
+
+        # Waits with self.cond held until condition() is true or Rover closes
+        deadline = None if timeout is None else time.time() + timeout
+        while not condition() and not self.is_closed:
+            if deadline is None:
+                self.cond.wait()
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+
+    def _sendKeepalive(self):
+        self._sendCommandPacket(KEEPALIVE)
 
     def _sendCommandByteRequest(self, id, bytes=[]):
-        self._sendCommandRequest(id, len(bytes), bytes)
+        self._sendCommandPacket(commandPacket(id, bytes))
         
     def _sendCommandIntRequest(self, id, intvals):
-        bytevals = []
-        for val in intvals:
-            for c in struct.pack('I', val):
-                bytevals.append(ord(c))
-        self._sendCommandRequest(id, 4*len(intvals), bytevals)       
+        self._sendCommandRequest(id, 4*len(intvals), packInts(intvals))       
 
     def _sendCommandRequest(self, id, n, contents):
-        self._sendRequest(self.commandsock, 'O', id, n, contents)
+        self._sendCommandPacket(makeRequest('O', id, n, contents))
+
+    def _sendCommandPacket(self, packet):
+        with self.sendLock:
+            self.commandsock.sendall(packet)
+
+    def _requestReply(self, packet, replyid, convert=None):
+
+        # Sends a command and returns a future for the reply with the specified
+        # ID, expecting it before sending so that it can't be missed
+        future = CommandFuture(convert)
+        with self.sendLock:
+            self.commandReader.expect(replyid, future)
+            self._sendCommandPacket(packet)
+        return future
 
     def _sendRequest(self, sock, c, id, n, contents):                  
-        bytes = [ord('M'), ord('O'), ord('_'), ord(c), id, \
-        0, 0, 0, 0, 0, 0, 0, 0, 0, 0, n, 0, 0, 0, 0, 0, 0, 0]
-        bytes.extend(contents)
-        request = ''.join(map(chr, bytes))
-        sock.send(request)
+        sock.sendall(makeRequest(c, id, n, contents))
         
     def _receiveCommandReply(self, count):
-        reply = self.commandsock.recv(count)
+        reply = b''
+        while len(reply) < count:
+            buf = self.commandsock.recv(count - len(reply))
+            if not buf:
+                break
+            reply += buf
         return reply
         
     def _newSocket(self):
@@ -177,52 +352,101 @@ class Rover:
            
 class Rover20(Rover):
 
-    def __init__(self):
+    def __init__(self, host='192.168.1.100', port=80):
 
-        Rover.__init__(self)
+        Rover.__init__(self, host, port)
         
         # Set up treads
         self.leftTread = _RoverTread(self, 4)
         self.rightTread = _RoverTread(self, 1)
+
+        # Sends tread speeds at a fixed rate when started
+        self.treadControl = None
      
     def close(self):
         ''' Closes off commuincation with Rover.
         '''
 
-        Rover.close(self)
-        
         # Stop moving treads
         self.setTreads(0, 0)
+        self.stopTreadControl()
+
+        Rover.close(self)
                 
     def getBatteryPercentage(self):
-        ''' Returns percentage of battery remaining.
+        ''' Returns percentage of battery remaining, asking the Rover only if
+            there is no fresh value from pollBatteryPercentage().
+        '''
+        percent = self.telemetry.get('battery')
+        if percent is None:
+            percent = self.requestBatteryPercentage().result(self.REPLY_TIMEOUT_SEC)
+        return percent
+
+    def getCachedBatteryPercentage(self):
+        ''' Returns the latest percentage from pollBatteryPercentage() without
+            waiting, or None if there is none or it is older than its TTL.
+        '''
+        return self.telemetry.get('battery')
+
+    def pollBatteryPercentage(self, period=30, ttl=None, onchange=None):
+        ''' Asks for the percentage of battery remaining every period seconds
+            in the background, caching the answer for getBatteryPercentage()
+            and getCachedBatteryPercentage().  Answers older than ttl seconds
+            (default = twice the period) are not used.  If specified,
+            onchange(percent, previous) is called when the percentage changes.
+        '''
+        self.telemetry.add('battery', self.requestBatteryPercentage, period, ttl, onchange)
+
+    def requestBatteryPercentage(self):
+        ''' Asks for the percentage of battery remaining without waiting for
+            the answer.  Returns a CommandFuture whose result() method waits for
+            the percentage, so that several requests can be in flight at once.
         '''
-        self._sendCommandByteRequest(251)
-        reply = self._receiveCommandReply(32)
-        return 15 * ord(reply[23])    
+        return self._requestReply(BATTERY, 252, _batteryPercentage)
         
     def setTreads(self, left, right):
         ''' Sets the speed of the left and right treads (wheels).  + = forward;
         - = backward; 0 = stop. Values should be in [-1..+1].
         ''' 
-        currTime = time.time()
-        
         self.leftTread.update(left)
         self.rightTread.update(right)
+
+    def startTreadControl(self, rate=20):
+        ''' Sends the speeds passed to setTreads() from a TreadControlLoop,
+            which checks them rate times per second and sends any that have
+            changed, rather than sending at most one change every
+            TREAD_DELAY_SEC.  Stops are still sent at once.  Returns the
+            TreadControlLoop, whose latencies and meanLatency() report how
+            long each command took from setTreads() to being handed to the
+            socket (not to reach the Rover).
+        '''
+        self.stopTreadControl()
+
+        self.treadControl = TreadControlLoop(self, rate, self.TREAD_DELAY_SEC)
+        self.leftTread, self.rightTread = self.treadControl.treads
+
+        return self.treadControl
+
+    def stopTreadControl(self):
+        ''' Stops the treads and the TreadControlLoop, if running.
+        '''
+        if self.treadControl:
+            self.setTreads(0, 0)
+            self.treadControl.close()
+            self.treadControl = None
+            self.leftTread = _RoverTread(self, 4)
+            self.rightTread = _RoverTread(self, 1)
       
     def turnLightsOn(self):    
         ''' Turns the headlights and taillights on.
         '''
-        self._setLights(8)   
+        self._sendCommandPacket(LIGHTS_ON)
         
     
     def turnLightsOff(self):   
         ''' Turns the headlights and taillights off.
         '''
-        self._setLights(9)    
-        
-    def _setLights(self, onoff):    
-        self._sendDeviceControlRequest(onoff, 0)
+        self._sendCommandPacket(LIGHTS_OFF)
 
     def processVideo(self, jpegbytes, timestamp_10msec):
         ''' Proccesses bytes from a JPEG image streamed from Rover.  
@@ -251,9 +475,14 @@ class Rover20(Rover):
   
 class Revolution(Rover):
 
-    def __init__(self):
+    # H.264 frames depend on earlier ones, so dropping any would corrupt the
+    # picture until the next keyframe; wait for processVideo() instead
+    VIDEO_QUEUE_SIZE = 64
+    VIDEO_QUEUE_POLICY = BLOCK
+
+    def __init__(self, host='192.168.1.100', port=80):
 
-        Rover.__init__(self)
+        Rover.__init__(self, host, port)
 
         self.steerdir_prev = 0
         self.command_prev = 0
@@ -262,7 +491,8 @@ class Revolution(Rover):
         self.using_turret = False
 
         # Set up vertical camera controller
-        self.cameraHorizontal = _RoverCamera(self, 5)
+        self.cameraHorizontal = _RoverCamera(self, CAMERA_PAN_PLUS, CAMERA_PAN_STOP,
+                                             CAMERA_PAN_MINUS)
  
     def drive(self, wheeldir, steerdir, goslow):
 
@@ -315,13 +545,13 @@ class Revolution(Rover):
     def useTurretCamera(self):    
         '''  Switches to turret camera.
         '''
-        self._sendUseCameraRequest(1)
+        self._sendCommandPacket(USE_TURRET_CAMERA)
          
     
     def useDrivingCamera(self):   
         '''  Switches to driving camera.
         '''
-        self._sendUseCameraRequest(2)
+        self._sendCommandPacket(USE_DRIVING_CAMERA)
 
     def moveCameraHorizontal(self, where):
         ''' Moves the camera up or down, or stops moving it.  A nonzero value for the 
@@ -330,21 +560,48 @@ class Revolution(Rover):
         '''
         self.cameraHorizontal.move(where)
  
-    def _sendUseCameraRequest(self, camera):
-        self._sendCommandByteRequest(19, [6, camera])
    
-# "Private" classes ===========================================================
+# "Private" functions, shared with other Rover clients =======================
+
+# Encrypts the challenge in the Rover's login reply
+def _loginResponse(reply):
+
+    TARGET_ID = 'AC13'
+    TARGET_PASSWORD = 'AC13'      
         
-# A special Blowfish variant with P-arrays set to zero instead of digits of Pi
-class _RoverBlowfish(Blowfish):
+    # Extract Blowfish key from camera ID in reply
+    cameraID = reply[25:37].decode('utf-8')
+    key = TARGET_ID + ':' + cameraID + '-save-private:' + TARGET_PASSWORD
     
-    def __init__(self, key):
-        
-        ORIG_P = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+    # Extract Blowfish inputs from rest of reply
+    L1 = bytes_to_int(reply, 66)
+    R1 = bytes_to_int(reply, 70)
+    L2 = bytes_to_int(reply, 74)
+    R2 = bytes_to_int(reply, 78)
+    
+    # Make Blowfish cipher from key, loading its tables only now that we need them
+    from .blowfish import RoverBlowfish
+    bf = RoverBlowfish(key)
+    
+    # Encrypt inputs from reply
+    L1,R1 = bf.encrypt(L1, R1)
+    L2,R2 = bf.encrypt(L2, R2)
 
-        self._keygen(key, ORIG_P)
+    return [L1, R1, L2, R2]
 
+# Converts a battery reply to a percentage
+def _batteryPercentage(reply):
+    return 15 * bytearray(reply)[23]
 
+# Shuts down a socket, waking up any thread blocked reading it
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except socket.error:
+        pass
+
+# "Private" classes ===========================================================
+        
 # A thread for reading streaming media from the Rover
 class _MediaThread(threading.Thread):
     
@@ -353,61 +610,85 @@ class _MediaThread(threading.Thread):
         threading.Thread.__init__(self)
         
         self.rover = rover
-        self.BUFSIZE = 1024
           
     def run(self):
                                     
-        # Accumulates media bytes
-        mediabytes = ''
+        # Splits media bytes into whole frames
+        demux = Demuxer()
                             
         # Starts True; set to False by Rover.close()       
-        while self.rover.is_active:
+        try:
+            while self.rover.is_active:
             
-            # Grab bytes from rover, halting on failure            
-            try:
-                buf = self.rover.mediasock.recv(self.BUFSIZE)
-            except:
+                # Grab bytes from rover, halting on failure            
+                try:
+                    if not demux.recvFrom(self.rover.mediasock):
+                        break
+                except:
+                    break
+
+                for msgid, frame in demux:
+                    self._handleFrame(msgid, frame)
+
+        # Stream ended: stop processing threads and wake up waiters
+        finally:
+            self.rover.videoQueue.close()
+            self.rover.audioQueue.close()
+            self.rover._setClosed()
+
+    def _handleFrame(self, msgid, frame):
+
+        # Skip stray messages, e.g. after resynchronizing inside a payload
+        if msgid not in (VIDEO, AUDIO):
+            return
+
+        # Skip corrupt frames
+        try:
+            payload, timestamp = decodeMediaFrame(msgid, frame)
+        except ValueError:
+            return
+
+        # Record frame as received; the capture writes on its own thread
+        capture = self.rover.capture
+        if capture:
+            capture.write(msgid, frame)
+
+        # Queue frame for processing routine
+        if msgid == VIDEO:
+            self.rover.videoQueue.put((payload, timestamp))
+        else:
+            self.rover.audioQueue.put((payload, timestamp))
+
+# A thread for passing queued frames of one kind to the Rover's processing routine
+class _DeliveryThread(threading.Thread):
+
+    def __init__(self, rover, msgid, queue):
+
+        threading.Thread.__init__(self)
+
+        self.rover = rover
+        self.msgid = msgid
+        self.queue = queue
+
+    def run(self):
+
+        # Runs until the queue is closed
+        while True:
+
+            frame = self.queue.get()
+            if frame is None:
                 break
 
-            # Do we have a media frame start?        
-            k = buf.find('MO_V')
-
-            # Yes
-            if k  >= 0:
-
-                # Already have media bytes?
-                if len(mediabytes) > 0:
-                    
-                    # Yes: add to media bytes up through start of new
-                    mediabytes += buf[0:k]
-
-                    # Both video and audio messages are time-stamped in 10msec units
-                    timestamp = bytes_to_uint(mediabytes, 23)
-
-                    # Video bytes: call processing routine
-                    if ord(mediabytes[4]) == 1:
-                        self.rover.processVideo(mediabytes[36:], timestamp)
-                    
-                    # Audio bytes: call processing routine
-                    else:
-                        audsize = bytes_to_uint(mediabytes, 36)
-                        sampend = 40 + audsize
-                        offset = bytes_to_short(mediabytes, sampend)
-                        index  = ord(mediabytes[sampend+2])
-                        pcmsamples = decodeADPCMToPCM(mediabytes[40:sampend], offset, index)
-                        self.rover.processAudio(pcmsamples, timestamp)                    
-                        
-                    # Start over with new bytes    
-                    mediabytes = buf[k:]
-             
-                # No media bytes yet: start with new bytes
+            if self.msgid == VIDEO:
+                dispatcher = self.rover.videoDispatcher
+                if dispatcher:
+                    dispatcher.submit(*frame)
                 else:
-                    mediabytes = buf[k:]
-            
-            # No: accumulate media bytes
+                    self.rover.processVideo(*frame)
             else:
-          
-                mediabytes += buf
+                self.rover.processAudio(*frame)
+
+            self.rover._frameProcessed(self.msgid, frame)
 
 class _RoverTread(object):
     
@@ -437,23 +718,27 @@ class _RoverTread(object):
 
 class _RoverCamera(object):
 
-    def __init__(self, rover, stopcmd):
+    def __init__(self, rover, moveplus, stop, moveminus):
         
         self.rover = rover
-        self.stopcmd = stopcmd
         self.isMoving = False
 
+        # Packets for moving up/right, stopping, and moving down/left
+        self.moveplus = moveplus
+        self.stop = stop
+        self.moveminus = moveminus
+
     def move(self, where):
 
         if where == 0:
             if self.isMoving:
-                self.rover._sendCameraRequest(self.stopcmd)
+                self.rover._sendCommandPacket(self.stop)
                 self.isMoving = False
         elif not self.isMoving:
             if where == 1:
-                self.rover._sendCameraRequest(self.stopcmd-1)
+                self.rover._sendCommandPacket(self.moveplus)
             else:
-                self.rover._sendCameraRequest(self.stopcmd+1)
+                self.rover._sendCommandPacket(self.moveminus)
             self.isMoving = True
 
 
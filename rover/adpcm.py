@@ -109,41 +109,138 @@ _stepTable = [
  29794,
  32767]
  
+from array import array
+
 def _constrain(val, minval, maxval):
     return min(max(val, minval), maxval)
 
+def _buildNibbleTable():
+
+    # Delta and next step index for each (step index, 4-bit code)
+    nibbles = []
+    for index in range(89):
+        row = []
+        for code in range(16):
+            mag = code & 0x07
+            delta = (_stepTable[index] * mag) // 4 + _stepTable[index] // 8
+            if code & 0x08:
+                delta = -delta
+            row.append((delta, _constrain(index + _indexAdjust[mag], 0, 88)))
+        nibbles.append(row)
+    return nibbles
+
+def _buildByteTable(nibbles):
+
+    # Each byte holds two codes, high nibble first, so a byte maps a step index
+    # to two deltas and the step index for the next byte
+    table = []
+    for index in range(89):
+        for b in range(256):
+            delta1, mid = nibbles[index][b >> 4]
+            delta2, nxt = nibbles[mid][b & 0x0F]
+            table.append((delta1, delta2, nxt << 8))
+    return table
+
+# Indexed by [step index][4-bit code]
+_nibbleTable = _buildNibbleTable()
+
+# Indexed by (step index << 8) | ADPCM byte
+_byteTable = _buildByteTable(_nibbleTable)
 
 def decodeADPCMToPCM(raw, pre_sample, index):
-    ''' Returns ordinary PCM samples in interval +/- 2^15, decoded from ADPCM samples
+    ''' Returns an array('h') of ordinary PCM samples in interval +/- 2^15, 
+        decoded from ADPCM samples.  The raw samples can be any bytes-like 
+        object.
     '''
+    table = _byteTable
     decoded = []
-   
-    for i in range(len(raw) << 1):
-        
-        b = ord(raw[i >> 1])
-
-        code = 0xF & b if i & 1 else b >> 4
-        
-        sb = 1 if code & 0x08 else 0
-                                              
-        code &= 0x07
-
-        delta = (_stepTable[index] * code) / 4 + _stepTable[index] / 8
-        
-        if sb:
-            delta = -delta
-        
-        pre_sample += delta;
-
-        pre_sample = _constrain(pre_sample, -32768, 32767)
-
-        decoded.append(pre_sample)
-                                                    
-        index += _indexAdjust[code];
-
-        index = _constrain(index, 0, 88)
-        
+    append = decoded.append
+
+    index <<= 8
+
+    for b in bytearray(raw):
+
+        delta1, delta2, index = table[index | b]
+
+        pre_sample += delta1
+        if pre_sample > 32767:
+            pre_sample = 32767
+        elif pre_sample < -32768:
+            pre_sample = -32768
+        append(pre_sample)
+
+        pre_sample += delta2
+        if pre_sample > 32767:
+            pre_sample = 32767
+        elif pre_sample < -32768:
+            pre_sample = -32768
+        append(pre_sample)
+
+    return array('h', decoded)
+
+def encodePCMToADPCM(samples, pre_sample, index):
+    ''' Returns ADPCM bytes encoding an even number of PCM samples, starting from
+        the specified sample and step index, along with the sample and step index
+        that follow them.  Decoding the bytes with decodeADPCMToPCM() from the 
+        same starting sample and step index reproduces the encoded samples as 
+        closely as ADPCM allows.
+    '''
+    encoded = bytearray()
+
+    for i, sample in enumerate(samples):
+
+        step = _stepTable[index]
+        diff = sample - pre_sample
+
+        # Pick the code whose delta comes closest to the difference
+        code = 0x08 if diff < 0 else 0
+        code |= _constrain(((abs(diff) - step // 8) * 4 + step // 2) // step, 0, 7)
+
+        # Track the decoder exactly, so that errors don't accumulate
+        delta, index = _nibbleTable[index][code]
+        pre_sample = _constrain(pre_sample + delta, -32768, 32767)
+
+        if i & 1:
+            encoded[-1] |= code
+        else:
+            encoded.append(code << 4)
+
+    return bytes(encoded), pre_sample, index
+
+def _decodeBlocks(blocks):
+
+    decoded = array('h')
+    for raw, pre_sample, index in blocks:
+        decoded.extend(decodeADPCMToPCM(raw, pre_sample, index))
+    return decoded
+
+def decodeADPCMBlocksToPCM(blocks, processes=None, blocksPerTask=256):
+    ''' Decodes a sequence of (raw, pre_sample, index) ADPCM blocks, such as the
+        audio frames of a recorded session, and returns their PCM samples 
+        concatenated in the order given as a single array('h').  Since each block
+        carries its own starting sample and step index, blocks are decoded in
+        parallel on a pool of the specified number of processes (default = one
+        per CPU).
+    '''
+    # Raw samples must be picklable, so copy out any memoryviews
+    blocks = [(bytes(bytearray(raw)), pre_sample, index) for raw, pre_sample, index in blocks]
+
+    tasks = [blocks[k:k+blocksPerTask] for k in range(0, len(blocks), blocksPerTask)]
+
+    if processes == 1 or len(tasks) < 2:
+        return _decodeBlocks(blocks)
+
+    # Imported here to keep importing rover fast
+    import multiprocessing
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = pool.map(_decodeBlocks, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+    decoded = array('h')
+    for result in results:
+        decoded.extend(result)
     return decoded
-             
-                
-        
@@ -0,0 +1,358 @@
+'''
+Python classes for interacting with the Brookstone Rover 2.0 and Rover
+Revolution from an asyncio event loop.  Requires Python 3.6 or later.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import asyncio
+import collections
+
+from . import Rover, Rover20, Revolution, _RoverTread, _RoverCamera
+from . import _loginResponse, _batteryPercentage
+from .commands import makeRequest, packInts, commandPacket
+from .commands import KEEPALIVE, BATTERY, USE_TURRET_CAMERA, USE_DRIVING_CAMERA
+from .commands import CAMERA_UP, CAMERA_STOP, CAMERA_DOWN
+from .commands import CAMERA_PAN_PLUS, CAMERA_PAN_STOP, CAMERA_PAN_MINUS
+from .demux import Demuxer, decodeMediaFrame, VIDEO, COMMAND_MAGIC
+
+class AsyncRover(object):
+
+    def __init__(self, host='192.168.1.100', port=80, queuesize=4):
+        ''' Creates an AsyncRover object for the Rover at the specified host and
+            port.  Call connect() (or use "async with") before sending commands.
+            Up to queuesize video frames and audio blocks are held for video()
+            and audio(); older ones are dropped when a consumer falls behind.
+        '''
+        self.HOST = host
+        self.PORT = port
+
+        self.TREAD_DELAY_SEC = 1.0
+        self.KEEPALIVE_PERIOD_SEC = 60
+        self.REPLY_TIMEOUT_SEC = 10
+
+        self.queuesize = queuesize
+        self.is_active = False
+
+    async def connect(self):
+        ''' Logs in to the Rover and starts the media streams.
+        '''
+        # Open command stream to Rover
+        self.reader, self.writer = await asyncio.open_connection(self.HOST, self.PORT)
+
+        # Send login request with four arbitrary numbers
+        self._sendCommandIntRequest(0, [0, 0, 0, 0])
+
+        # Get login reply
+        reply = await self._receiveCommandReply(82)
+
+        # Send encrypted reply to Rover
+        self._sendCommandIntRequest(2, _loginResponse(reply))
+
+        # Ignore reply from Rover
+        await self._receiveCommandReply(26)
+
+        # Set up vertical camera controller
+        self.cameraVertical = _RoverCamera(self, CAMERA_UP, CAMERA_STOP, CAMERA_DOWN)
+
+        # Send video-start request
+        self._sendCommandIntRequest(4, [1])
+
+        # Get reply from Rover
+        reply = await self._receiveCommandReply(29)
+
+        # Open media stream to Rover
+        self.mediareader, self.mediawriter = \
+            await asyncio.open_connection(self.HOST, self.PORT)
+
+        # Send video-start request based on last four bytes of reply
+        self.mediawriter.write(makeRequest('V', 0, 4, bytearray(reply[25:])))
+
+        # Send audio-start request
+        self._sendCommandByteRequest(8, [1])
+
+        # Ignore audio-start reply
+        await self._receiveCommandReply(25)
+
+        # Frames waiting for video() and audio()
+        self.videoQueue = asyncio.Queue(self.queuesize)
+        self.audioQueue = asyncio.Queue(self.queuesize)
+
+        # Futures waiting for replies, by reply ID, oldest first
+        self.replies = collections.defaultdict(collections.deque)
+
+        # Read replies and media and send keep-alive messages in the background
+        self.is_active = True
+        self.tasks = [asyncio.ensure_future(self._readCommands()),
+                      asyncio.ensure_future(self._readMedia()),
+                      asyncio.ensure_future(self._keepAlive())]
+
+    async def close(self):
+        ''' Closes off communication with Rover.
+        '''
+        self.is_active = False
+
+        for task in self.tasks:
+            task.cancel()
+
+        self.writer.close()
+        self.mediawriter.close()
+
+        # Wake up any video() and audio() consumers
+        for queue in (self.videoQueue, self.audioQueue):
+            _putLatest(queue, None)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def video(self):
+        ''' Asynchronously iterates over (image bytes, timestamp) pairs for
+            frames streamed from Rover until the Rover is closed.  Timestamps
+            are in 10msec units.
+        '''
+        async for frame in self._frames(self.videoQueue):
+            yield frame
+
+    async def audio(self):
+        ''' Asynchronously iterates over (PCM samples, timestamp) pairs for
+            audio blocks streamed from Rover until the Rover is closed.
+        '''
+        async for frame in self._frames(self.audioQueue):
+            yield frame
+
+    async def turnStealthOn(self):
+        ''' Turns on stealth mode (infrared).
+        '''
+        Rover.turnStealthOn(self)
+        await self.writer.drain()
+
+    async def turnStealthOff(self):
+        ''' Turns off stealth mode (infrared).
+        '''
+        Rover.turnStealthOff(self)
+        await self.writer.drain()
+
+    async def moveCameraVertical(self, where):
+        ''' Moves the camera up or down, or stops moving it.  A nonzero value for the
+            where parameter causes the camera to move up (+) or down (-).  A
+            zero value stops the camera from moving.
+        '''
+        Rover.moveCameraVertical(self, where)
+        await self.writer.drain()
+
+    async def _frames(self, queue):
+        while self.is_active:
+            frame = await queue.get()
+            if frame is None:
+                break
+            yield frame
+
+    async def _readMedia(self):
+
+        # Splits media bytes into whole frames
+        demux = Demuxer()
+
+        try:
+            while self.is_active:
+
+                data = await self.mediareader.read(65536)
+                if not data:
+                    break
+
+                demux.feed(data)
+
+                for msgid, frame in demux:
+
+                    # Skip stray messages and corrupt frames
+                    try:
+                        payload, timestamp = decodeMediaFrame(msgid, frame)
+                    except ValueError:
+                        continue
+
+                    _putLatest(self.videoQueue if msgid == VIDEO else self.audioQueue,
+                               (payload, timestamp))
+
+        # Media stream closed: end video() and audio()
+        finally:
+            for queue in (self.videoQueue, self.audioQueue):
+                _putLatest(queue, None)
+
+    async def _keepAlive(self):
+        while True:
+            self._sendCommandPacket(KEEPALIVE)
+            await self.writer.drain()
+            await asyncio.sleep(self.KEEPALIVE_PERIOD_SEC)
+
+    async def _readCommands(self):
+
+        # Splits reply bytes into whole messages, handing each to the oldest
+        # request still waiting for its ID
+        demux = Demuxer(COMMAND_MAGIC, 1024)
+
+        try:
+            while True:
+
+                data = await self.reader.read(4096)
+                if not data:
+                    break
+
+                demux.feed(data)
+
+                for msgid, message in demux:
+                    waiting = self.replies.get(msgid)
+                    while waiting:
+                        future = waiting.popleft()
+                        if not future.done():
+                            future.set_result(message.tobytes())
+                            break
+
+        # Command stream closed: fail requests still waiting
+        finally:
+            for waiting in self.replies.values():
+                for future in waiting:
+                    if not future.done():
+                        future.set_exception(IOError('Connection to Rover closed'))
+            self.replies.clear()
+
+    async def _requestReply(self, packet, replyid):
+
+        # Sends a request and returns the reply with the specified ID, waiting
+        # up to REPLY_TIMEOUT_SEC; a timed-out request's future is cancelled,
+        # so its reply goes to the next request
+        future = asyncio.get_event_loop().create_future()
+        self.replies[replyid].append(future)
+
+        self._sendCommandPacket(packet)
+        await self.writer.drain()
+
+        try:
+            return await asyncio.wait_for(future, self.REPLY_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            raise IOError('Timed out waiting for reply from Rover')
+
+    def _sendCommandByteRequest(self, id, bytes=[]):
+        self._sendCommandPacket(commandPacket(id, bytes))
+
+    def _sendCommandIntRequest(self, id, intvals):
+        self._sendCommandRequest(id, 4*len(intvals), packInts(intvals))
+
+    def _sendCommandRequest(self, id, n, contents):
+        self._sendCommandPacket(makeRequest('O', id, n, contents))
+
+    def _sendCommandPacket(self, packet):
+        self.writer.write(packet)
+
+    async def _receiveCommandReply(self, count):
+        return await self.reader.readexactly(count)
+
+    def _sendDeviceControlRequest(self, a, b) :
+        self._sendCommandByteRequest(250, [a,b])
+
+    def _sendCameraRequest(self, request):
+        self._sendCommandByteRequest(14, [request])
+
+
+class AsyncRover20(AsyncRover):
+
+    async def connect(self):
+
+        await AsyncRover.connect(self)
+
+        # Set up treads
+        self.leftTread = _RoverTread(self, 4)
+        self.rightTread = _RoverTread(self, 1)
+
+    async def close(self):
+        ''' Closes off communication with Rover.
+        '''
+        # Stop moving treads
+        await self.setTreads(0, 0)
+
+        await AsyncRover.close(self)
+
+    async def getBatteryPercentage(self):
+        ''' Returns percentage of battery remaining.
+        '''
+        return _batteryPercentage(await self._requestReply(BATTERY, 252))
+
+    async def setTreads(self, left, right):
+        ''' Sets the speed of the left and right treads (wheels).  + = forward;
+        - = backward; 0 = stop. Values should be in [-1..+1].
+        '''
+        Rover20.setTreads(self, left, right)
+        await self.writer.drain()
+
+    async def turnLightsOn(self):
+        ''' Turns the headlights and taillights on.
+        '''
+        Rover20.turnLightsOn(self)
+        await self.writer.drain()
+
+    async def turnLightsOff(self):
+        ''' Turns the headlights and taillights off.
+        '''
+        Rover20.turnLightsOff(self)
+        await self.writer.drain()
+
+    def _spinWheels(self, wheeldir, speed):
+        self._sendDeviceControlRequest(wheeldir, speed)
+
+
+class AsyncRevolution(AsyncRover):
+
+    async def connect(self):
+
+        await AsyncRover.connect(self)
+
+        self.steerdir_prev = 0
+        self.command_prev = 0
+        self.goslow_prev = 0
+
+        # Set up horizontal camera controller
+        self.cameraHorizontal = _RoverCamera(self, CAMERA_PAN_PLUS, CAMERA_PAN_STOP,
+                                             CAMERA_PAN_MINUS)
+
+    async def drive(self, wheeldir, steerdir, goslow):
+        ''' Drives forward (wheeldir = +1) or backward (-1), steering right
+            (steerdir = +1) or left (-1), slowly or not.
+        '''
+        Revolution.drive(self, wheeldir, steerdir, goslow)
+        await self.writer.drain()
+
+    async def useTurretCamera(self):
+        '''  Switches to turret camera.
+        '''
+        self._sendCommandPacket(USE_TURRET_CAMERA)
+        await self.writer.drain()
+
+    async def useDrivingCamera(self):
+        '''  Switches to driving camera.
+        '''
+        self._sendCommandPacket(USE_DRIVING_CAMERA)
+        await self.writer.drain()
+
+    async def moveCameraHorizontal(self, where):
+        ''' Moves the camera left or right, or stops moving it.
+        '''
+        Revolution.moveCameraHorizontal(self, where)
+        await self.writer.drain()
+
+# Queues an item, dropping the oldest one if the queue is full
+def _putLatest(queue, item):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
@@ -0,0 +1,297 @@
+'''
+Python classes for recording raw Rover media streams to an indexed capture file
+and reading them back.
+
+A capture file is an eight-byte header, followed by one record per media
+message (message ID, timestamp, length, and the message bytes exactly as
+received), followed by an index of (timestamp, offset) entries sorted by
+timestamp and a trailer giving the index's offset and length.  A file whose
+recording was cut off before the index was written can still be read; its
+index is rebuilt by scanning the records.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import array
+import collections
+import mmap
+import struct
+import threading
+
+_MAGIC = b'RVCAP\x00\x01\x00'
+_TRAILER_MAGIC = b'RVCAPIDX'
+
+# Message ID, timestamp (10msec units), message length
+_record = struct.Struct('<BII')
+
+# Timestamp, record offset
+_entry = struct.Struct('<IQ')
+
+# Index offset, entry count, magic
+_trailer = struct.Struct('<QQ8s')
+
+_uint32 = struct.Struct('<I')
+
+# Python 2 has no 64-bit array type code, but its 'L' is 64 bits on most
+# platforms
+def _offsetArray():
+    try:
+        return array.array('Q')
+    except ValueError:
+        return array.array('L')
+
+class CaptureWriter(object):
+
+    def __init__(self, filename, maxbytes=16777216, block=False):
+        ''' Creates a CaptureWriter that records media messages to the specified
+            file, replacing any existing file.  Messages are written on a
+            background thread, so that a slow disk doesn't hold up the thread
+            that receives them.  Up to maxbytes of messages are buffered;
+            beyond that, write() drops messages, or waits for room if block is
+            True.
+        '''
+        self.maxbytes = maxbytes
+        self.block = block
+
+        self.file = open(filename, 'wb')
+        self.file.write(_MAGIC)
+        self.offset = len(_MAGIC)
+
+        # Timestamps and record offsets, kept compactly for long captures
+        self.timestamps = array.array('I')
+        self.offsets = _offsetArray()
+
+        self.records = collections.deque()
+        self.buffered = 0
+        self.cond = threading.Condition()
+
+        # Messages dropped because the disk fell behind, and the error that
+        # stopped recording, if any
+        self.dropped = 0
+        self.error = None
+
+        self.is_active = True
+
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write(self, msgid, message):
+        ''' Queues a whole media message, as yielded by a Demuxer, for
+            appending.  Returns False if it was dropped, or if recording has
+            stopped because the writer was closed or the file failed.
+        '''
+        timestamp = _uint32.unpack_from(message, 23)[0]
+        data = message.tobytes() if isinstance(message, memoryview) else bytes(message)
+        record = _record.pack(msgid, timestamp, len(message)) + data
+
+        with self.cond:
+
+            if self.block:
+                while self.is_active and self.buffered and \
+                      self.buffered + len(record) > self.maxbytes:
+                    self.cond.wait()
+
+            if not self.is_active:
+                return False
+
+            if self.buffered and self.buffered + len(record) > self.maxbytes:
+                self.dropped += 1
+                return False
+
+            self.records.append(record)
+            self.timestamps.append(timestamp)
+            self.buffered += len(record)
+            self.cond.notify_all()
+
+            return True
+
+    def close(self):
+        ''' Waits for queued messages to be written, then writes the index and
+            closes the file.  After a write error, the file is closed without
+            an index, which CaptureReader rebuilds.
+        '''
+        with self.cond:
+            if self.is_active:
+                self.is_active = False
+                self.cond.notify_all()
+
+        self.thread.join()
+
+        if self.file.closed:
+            return
+
+        try:
+            if not self.error:
+                self._writeIndex()
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+
+        try:
+
+            while True:
+
+                with self.cond:
+                    while self.is_active and not self.records:
+                        self.cond.wait()
+                    if not self.records:
+                        break
+                    records = list(self.records)
+                    self.records.clear()
+
+                for record in records:
+                    self.file.write(record)
+                    self.offsets.append(self.offset)
+                    self.offset += len(record)
+
+                with self.cond:
+                    self.buffered -= sum(len(record) for record in records)
+                    self.cond.notify_all()
+
+        except (IOError, OSError, ValueError) as e:
+            self.error = e
+
+        with self.cond:
+            self.is_active = False
+            self.records.clear()
+            self.buffered = 0
+            self.cond.notify_all()
+
+    def _writeIndex(self):
+
+        timestamps, offsets = self.timestamps, self.offsets
+
+        # Messages arrive almost in timestamp order, so usually there's no
+        # need to sort
+        order = range(len(offsets))
+        if any(timestamps[k] > timestamps[k+1] for k in range(len(offsets) - 1)):
+            order = sorted(order, key=timestamps.__getitem__)
+
+        for k in order:
+            self.file.write(_entry.pack(timestamps[k], offsets[k]))
+        self.file.write(_trailer.pack(self.offset, len(offsets), _TRAILER_MAGIC))
+
+class CaptureReader(object):
+
+    def __init__(self, filename):
+        ''' Opens the specified capture file for reading by memory-mapping it.
+        '''
+        self.file = open(filename, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[:len(_MAGIC)] != _MAGIC:
+            raise IOError('%s is not a Rover capture file' % filename)
+
+        # Python 2 cannot make memoryviews on a mmap, so slices are copies there
+        try:
+            self.view = memoryview(self.map)
+        except TypeError:
+            self.view = self.map
+
+        self._readIndex()
+
+    def __len__(self):
+        ''' Returns the number of messages in the capture.
+        '''
+        return self.count
+
+    def __getitem__(self, k):
+        ''' Returns (message ID, timestamp, message) for the message at position
+            k in timestamp order.  The message is a view on the file, valid
+            until the reader is closed.
+        '''
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError('capture index out of range')
+        return self._record(self._entry(k)[1])
+
+    def seek(self, timestamp):
+        ''' Returns the position of the first message at or after the specified
+            timestamp, by binary search of the index.
+        '''
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def frames(self, start=0, stop=None):
+        ''' Yields (message ID, timestamp, message) for the messages from position
+            start up to position stop (default = the end).
+        '''
+        stop = self.count if stop is None else min(stop, self.count)
+        for k in range(start, stop):
+            yield self[k]
+
+    def close(self):
+        ''' Closes the file.  Messages returned by the reader must have been
+            released first.
+        '''
+        if hasattr(self.view, 'release'):
+            self.view.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _entry(self, k):
+        return _entry.unpack_from(self.indexBuffer, self.indexOffset + k * _entry.size)
+
+    def _record(self, offset):
+        msgid, timestamp, length = _record.unpack_from(self.map, offset)
+        start = offset + _record.size
+        return msgid, timestamp, self.view[start:start+length]
+
+    def _readIndex(self):
+
+        size = len(self.map)
+
+        if size >= len(_MAGIC) + _trailer.size:
+            indexOffset, count, magic = _trailer.unpack_from(self.map, size - _trailer.size)
+            if magic == _TRAILER_MAGIC and \
+               indexOffset + count * _entry.size + _trailer.size == size:
+                self.indexBuffer = self.map
+                self.indexOffset = indexOffset
+                self.count = count
+                return
+
+        # No index: rebuild it from the records, keeping only whole ones
+        entries = []
+        offset = len(_MAGIC)
+        while offset + _record.size <= size:
+            msgid, timestamp, length = _record.unpack_from(self.map, offset)
+            if offset + _record.size + length > size:
+                break
+            entries.append((timestamp, offset))
+            offset += _record.size + length
+        entries.sort()
+
+        self.indexBuffer = b''.join(_entry.pack(*entry) for entry in entries)
+        self.indexOffset = 0
+        self.count = len(entries)
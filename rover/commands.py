@@ -0,0 +1,71 @@
+'''
+Python functions for encoding requests to the Rover.  Command packets that
+never change are built once, here, and others are cached as they are built.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import struct
+
+# 'MO_' + type, message ID at byte 4, contents length at byte 15, zero padding
+_header = struct.Struct('<4sB10xI4x')
+
+_magic = {'O': b'MO_O', 'V': b'MO_V'}
+
+# Structs for packing 32-bit integers, by count
+_intStructs = {}
+
+# Command packets, by (command ID, contents)
+_packets = {}
+
+def makeRequest(c, id, n, contents):
+    ''' Returns the bytes of a request of the specified type ('O' for command,
+        'V' for media), with the specified message ID, contents length, and
+        contents.
+    '''
+    return _header.pack(_magic[c], id, n) + bytes(bytearray(contents))
+
+def packInts(intvals):
+    ''' Packs 32-bit integers into a request's contents.
+    '''
+    count = len(intvals)
+    packer = _intStructs.get(count)
+    if not packer:
+        packer = _intStructs[count] = struct.Struct('<%dI' % count)
+    return packer.pack(*[val & 0xFFFFFFFF for val in intvals])
+
+def commandPacket(id, contents=()):
+    ''' Returns the bytes of a command request with the specified command ID
+        and byte values, building it only the first time it is requested.
+    '''
+    key = (id, tuple(contents))
+    packet = _packets.get(key)
+    if packet is None:
+        packet = _packets[key] = makeRequest('O', id, len(contents), contents)
+    return packet
+
+# Fixed commands
+KEEPALIVE          = commandPacket(255)
+BATTERY            = commandPacket(251)
+LIGHTS_ON          = commandPacket(250, (8, 0))
+LIGHTS_OFF         = commandPacket(250, (9, 0))
+STEALTH_ON         = commandPacket(14, (94,))
+STEALTH_OFF        = commandPacket(14, (95,))
+CAMERA_UP          = commandPacket(14, (0,))
+CAMERA_STOP        = commandPacket(14, (1,))
+CAMERA_DOWN        = commandPacket(14, (2,))
+CAMERA_PAN_PLUS    = commandPacket(14, (4,))     # moveCameraHorizontal(+1)
+CAMERA_PAN_STOP    = commandPacket(14, (5,))
+CAMERA_PAN_MINUS   = commandPacket(14, (6,))     # moveCameraHorizontal(-1)
+USE_TURRET_CAMERA  = commandPacket(19, (6, 1))
+USE_DRIVING_CAMERA = commandPacket(19, (6, 2))
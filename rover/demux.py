@@ -0,0 +1,171 @@
+'''
+A Python class for splitting the Rover's byte streams into whole messages.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import struct
+
+from .adpcm import decodeADPCMToPCM
+
+# Every message starts with a 23-byte header: four magic bytes ('MO_V' for
+# media, 'MO_O' for commands), a one-byte message ID, and a four-byte payload
+# length at offset 15
+HEADER_SIZE = 23
+
+MEDIA_MAGIC   = b'MO_V'
+COMMAND_MAGIC = b'MO_O'
+
+# Longest message believed; a longer length means a corrupt header
+MAX_MESSAGE_SIZE = 4 << 20
+
+# Media message IDs
+VIDEO = 1
+AUDIO = 2
+
+_uint32 = struct.Struct('<I')
+_int16  = struct.Struct('<h')
+_uint8  = struct.Struct('<B')
+
+class Demuxer(object):
+
+    def __init__(self, magic=MEDIA_MAGIC, bufsize=65536, maxsize=MAX_MESSAGE_SIZE):
+        ''' Creates a Demuxer that splits a byte stream into whole messages
+            starting with the specified magic bytes.  Bytes are received into a
+            preallocated buffer, which grows as needed to hold the largest
+            message seen.  A header giving a message longer than maxsize bytes
+            is taken to be corrupt, and skipped.
+        '''
+        self.magic = magic
+        self.maxsize = maxsize
+        self.buf = bytearray(bufsize)
+        self.view = memoryview(self.buf)
+
+        # Start of unconsumed bytes, end of received bytes
+        self.start = 0
+        self.end = 0
+
+    def recvFrom(self, sock):
+        ''' Receives bytes from the specified socket directly into the buffer,
+            returning the number of bytes received (zero when the socket has
+            been closed).
+        '''
+        self._makeRoom()
+        n = sock.recv_into(self.view[self.end:])
+        self.end += n
+        return n
+
+    def feed(self, data):
+        ''' Copies bytes from a source other than a socket into the buffer.
+        '''
+        n = len(data)
+        self._makeRoom(n)
+        self.buf[self.end:self.end+n] = data
+        self.end += n
+
+    def __iter__(self):
+        ''' Yields (ID, message) pairs for each complete message in the buffer,
+            where message is a memoryview of the whole message, header included.
+            A message view is only valid until the next call to recvFrom() or
+            feed(); copy it to keep it longer.
+        '''
+        buf = self.buf
+        magic = self.magic
+
+        while self.end - self.start >= HEADER_SIZE:
+
+            # Resynchronize on the next magic bytes if we're not at one
+            if not buf.startswith(magic, self.start):
+                k = buf.find(magic, self.start+1, self.end)
+                if k < 0:
+                    # Keep a possible partial magic at the end
+                    self.start = max(self.start, self.end - 3)
+                    return
+                self.start = k
+                continue
+
+            length = HEADER_SIZE + _uint32.unpack_from(buf, self.start+15)[0]
+
+            # Resynchronize past a corrupt header, or magic bytes in a payload
+            if length > self.maxsize:
+                self.start += len(magic)
+                continue
+
+            # Wait for rest of message
+            if self.end - self.start < length:
+                self._reserve(length)
+                return
+
+            start = self.start
+            self.start += length
+
+            yield buf[start+4], self.view[start:start+length]
+
+    def _reserve(self, length):
+
+        # Grow the buffer if it cannot hold a message this long
+        if length > len(self.buf):
+            self._moveTo(bytearray(2*length))
+
+    def _makeRoom(self, n=1):
+
+        # Rewind when everything has been consumed
+        if self.start == self.end:
+            self.start = self.end = 0
+
+        # Compact when out of space, moving only the partial message
+        if len(self.buf) - self.end < n:
+            if self.end - self.start + n > len(self.buf):
+                self._moveTo(bytearray(2*(self.end - self.start + n)))
+            else:
+                self._moveTo(self.buf)
+
+    def _moveTo(self, newbuf):
+
+        # Copy into a fresh buffer rather than resizing, so that outstanding
+        # message views remain safe
+        count = self.end - self.start
+        newbuf[0:count] = self.buf[self.start:self.end]
+        if newbuf is not self.buf:
+            self.buf = newbuf
+            self.view = memoryview(newbuf)
+        self.start = 0
+        self.end = count
+
+def decodeMediaFrame(msgid, frame):
+    ''' Returns (payload, timestamp) for a media message from a Demuxer or a
+        capture file.  The payload is a byte string of image data for video 
+        messages, or an array of PCM samples for audio messages.  Both video 
+        and audio messages are time-stamped in 10msec units.  Raises ValueError
+        for a message that is neither, or is too short for its contents.
+    '''
+    if msgid == VIDEO:
+        if len(frame) < 36:
+            raise ValueError('Video message too short: %d bytes' % len(frame))
+        timestamp = _uint32.unpack_from(frame, 23)[0]
+        video = frame[36:]
+        return (video.tobytes() if isinstance(video, memoryview) else bytes(video)), timestamp
+
+    if msgid != AUDIO:
+        raise ValueError('Unknown media message ID: %d' % msgid)
+
+    if len(frame) < 40:
+        raise ValueError('Audio message too short: %d bytes' % len(frame))
+    timestamp = _uint32.unpack_from(frame, 23)[0]
+    audsize = _uint32.unpack_from(frame, 36)[0]
+    sampend = 40 + audsize
+    if sampend + 3 > len(frame):
+        raise ValueError('Audio message too short for %d samples' % audsize)
+    offset = _int16.unpack_from(frame, sampend)[0]
+    index  = _uint8.unpack_from(frame, sampend+2)[0]
+    return decodeADPCMToPCM(frame[40:sampend], offset, index), timestamp
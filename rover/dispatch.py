@@ -0,0 +1,136 @@
+'''
+A Python class for processing media frames on a pool of worker threads or
+processes, optionally delivering the results in the order the frames arrived.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import sys
+import threading
+import traceback
+
+class FrameDispatcher(object):
+
+    def __init__(self, function, onresult=None, workers=4, processes=False,
+                 ordered=True, maxInFlight=None):
+        ''' Creates a FrameDispatcher that calls function(payload, timestamp) for
+            each submitted frame on a pool of the specified number of worker
+            threads, or worker processes if processes is True (function must
+            then be picklable, e.g. defined at module level).  Each result is
+            passed to onresult(result, timestamp), in the order the frames were
+            submitted if ordered is True, or as soon as it is ready otherwise.
+            At most maxInFlight frames (default = twice the number of workers)
+            are processed or waiting at once; submit() blocks beyond that.
+        '''
+        self.function = function
+        self.onresult = onresult
+        self.ordered = ordered
+
+        # Imported here to keep importing rover fast
+        import multiprocessing
+        import multiprocessing.pool
+
+        if processes:
+            self.pool = multiprocessing.Pool(workers)
+        else:
+            self.pool = multiprocessing.pool.ThreadPool(workers)
+
+        self.slots = threading.Semaphore(maxInFlight or 2 * workers)
+
+        # Results that arrived ahead of an earlier frame's, keyed by sequence number
+        self.lock = threading.RLock()
+        self.pending = {}
+        self.nextSubmitted = 0
+        self.nextDelivered = 0
+
+        # Number of frames whose processing or result handling raised an
+        # exception
+        self.errors = 0
+
+        self.closed = False
+
+    def submit(self, payload, timestamp):
+        ''' Queues a frame for processing, waiting if too many frames are
+            already in flight.
+        '''
+        self.slots.acquire()
+
+        with self.lock:
+            if self.closed:
+                self.slots.release()
+                return
+            seq = self.nextSubmitted
+            self.nextSubmitted += 1
+
+        callbacks = {'callback': lambda outcome: self._finished(seq, timestamp, outcome)}
+
+        # Also finish a frame whose job failed outside the function, e.g. an
+        # unpicklable result, so its slot is freed and later results delivered
+        # (Python 2's pools can't report this)
+        if sys.version_info[0] >= 3:
+            callbacks['error_callback'] = lambda error: \
+                self._finished(seq, timestamp, ('Frame processing failed: %r\n' % error, None))
+
+        self.pool.apply_async(_process, (self.function, payload, timestamp), **callbacks)
+
+    def close(self):
+        ''' Stops accepting frames.  Frames already in flight finish processing,
+            but their results are discarded.
+        '''
+        with self.lock:
+            self.closed = True
+            self.pending.clear()
+        self.pool.close()
+
+    def _finished(self, seq, timestamp, outcome):
+
+        # Runs on the pool's result thread
+        self.slots.release()
+
+        with self.lock:
+
+            if self.closed:
+                return
+
+            if self.ordered:
+                self.pending[seq] = (timestamp, outcome)
+                while self.nextDelivered in self.pending:
+                    self._deliver(*self.pending.pop(self.nextDelivered))
+                    self.nextDelivered += 1
+            else:
+                self._deliver(timestamp, outcome)
+
+    def _deliver(self, timestamp, outcome):
+
+        error, result = outcome
+
+        if error:
+            self.errors += 1
+            sys.stderr.write(error)
+
+        elif self.onresult:
+
+            # An exception here would kill the pool's result thread
+            try:
+                self.onresult(result, timestamp)
+            except Exception:
+                self.errors += 1
+                sys.stderr.write(traceback.format_exc())
+
+# Runs on a worker, returning (traceback, None) instead of raising so that
+# results stay in order
+def _process(function, payload, timestamp):
+    try:
+        return None, function(payload, timestamp)
+    except Exception:
+        return traceback.format_exc(), None
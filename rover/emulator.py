@@ -0,0 +1,306 @@
+'''
+A Python class emulating a Brookstone Rover on the local machine, for testing
+and benchmarking without a Rover.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import math
+import os
+import socket
+import struct
+import threading
+import time
+
+from . import _loginResponse
+from .commands import makeRequest, packInts
+from .adpcm import encodePCMToADPCM
+from .demux import HEADER_SIZE, MEDIA_MAGIC, VIDEO, AUDIO
+
+class RoverEmulator(object):
+
+    def __init__(self, host='127.0.0.1', port=0, framerate=15, videoframes=None,
+                 framesize=20000, audio=None, audioblock=320, samplerate=8192,
+                 realtime=True, battery=90, cameraID='0123456789AB'):
+        ''' Creates a RoverEmulator that will listen on the specified host and
+            port (0 = any free port; see the PORT attribute after start()).
+            Video frames are streamed at framerate frames per second, cycling
+            through the byte strings in videoframes; by default they are
+            synthetic JPEG-delimited frames of framesize bytes.  Audio is
+            streamed in ADPCM blocks of audioblock samples at samplerate
+            samples per second, cycling through the PCM samples in audio; by
+            default a 440 Hz tone.  If realtime is False, frames and blocks are
+            sent in the same order but as fast as the connection allows.
+        '''
+        self.HOST = host
+        self.PORT = port
+
+        self.framerate = framerate
+        self.videoframes = videoframes or [_syntheticFrame(framesize)]
+        self.audio = audio or _tone(440, samplerate)
+        self.audioblock = audioblock
+        self.samplerate = samplerate
+        self.realtime = realtime
+        self.battery = battery
+        self.cameraID = cameraID
+
+        # (command ID, contents) for every command received after login
+        self.commands = []
+
+        # Time at which the most recent media stream started
+        self.startTime = None
+
+        # Times at which that stream's video frames and audio blocks were sent,
+        # by their timestamps (unique to each frame or block when realtime)
+        self.videoSendTimes = {}
+        self.audioSendTimes = {}
+
+        self.is_active = False
+
+    def start(self):
+        ''' Starts accepting connections on a background thread.
+        '''
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.HOST, self.PORT))
+        self.sock.listen(5)
+        self.PORT = self.sock.getsockname()[1]
+
+        self.sessions = []
+        self.is_active = True
+
+        # Command sessions, keyed by the media key sent on video start
+        self.keys = {}
+
+        _startThread(self._accept)
+
+    def close(self):
+        ''' Stops the emulator and closes all connections.
+        '''
+        self.is_active = False
+        self.sock.close()
+        for session in self.sessions:
+            session.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _accept(self):
+        while self.is_active:
+            try:
+                sock, _ = self.sock.accept()
+            except socket.error:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = _Session(self, sock)
+            self.sessions.append(session)
+            _startThread(session.run)
+
+# Shared state of one Rover login: its command connection and media connection
+class _Session(object):
+
+    def __init__(self, emulator, sock):
+
+        self.emulator = emulator
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.is_active = True
+
+    def run(self):
+
+        try:
+            header, contents = _receiveMessage(self.sock)
+        except socket.error:
+            return
+
+        if header is None:
+            return
+
+        if header.startswith(MEDIA_MAGIC):
+            self._stream(contents)
+        else:
+            self._command(header, contents)
+
+    def close(self):
+        self.is_active = False
+        self.sock.close()
+
+    def send(self, msgid, contents, magic='O'):
+        with self.lock:
+            self.sock.sendall(makeRequest(magic, msgid, len(contents), contents))
+
+    def _command(self, header, contents):
+
+        emulator = self.emulator
+
+        # Login challenge: camera ID at offset 25, four random numbers at 66
+        challenge = os.urandom(16)
+        reply = bytearray(59)
+        reply[2:14] = emulator.cameraID.encode('utf-8')
+        reply[43:59] = challenge
+        self.send(1, reply)
+
+        # Check response, encrypted with Rover's Blowfish variant
+        header, contents = _receiveMessage(self.sock)
+        expected = _loginResponse(makeRequest('O', 1, 59, reply))
+        if header is None or bytes(contents) != packInts(expected):
+            self.close()
+            return
+        self.send(3, bytearray(3))
+
+        while self.is_active and emulator.is_active:
+
+            try:
+                header, contents = _receiveMessage(self.sock)
+            except socket.error:
+                break
+            if header is None:
+                break
+
+            msgid = bytearray(header)[4]
+
+            # Video start: reply with key for media connection
+            if msgid == 4:
+                key = os.urandom(4)
+                emulator.keys[key] = self
+                self.audioOn = False
+                self.send(5, bytearray(2) + key)
+
+            # Audio start
+            elif msgid == 8:
+                self.audioOn = True
+                self.send(9, bytearray(2))
+
+            # Battery level, in 15% units
+            elif msgid == 251:
+                reply = bytearray(9)
+                reply[0] = emulator.battery // 15
+                self.send(252, reply)
+
+            else:
+                emulator.commands.append((msgid, bytes(contents)))
+
+        self.close()
+
+    def _stream(self, key):
+
+        emulator = self.emulator
+        command = emulator.keys.get(bytes(key))
+        if not command:
+            self.close()
+            return
+
+        start = emulator.startTime = time.time()
+        emulator.videoSendTimes = {}
+        emulator.audioSendTimes = {}
+        frame = sample = 0
+        pre_sample, index = 0, 0
+        audio = list(emulator.audio)
+        looped = audio + audio[:emulator.audioblock]
+
+        while self.is_active and command.is_active and emulator.is_active:
+
+            # Send whichever of video and audio is due next
+            videotime = frame / float(emulator.framerate)
+            audiotime = sample / float(emulator.samplerate)
+            sendaudio = command.audioOn and audiotime < videotime
+            due = audiotime if sendaudio else videotime
+
+            delay = start + due - time.time()
+            if emulator.realtime and delay > 0:
+                time.sleep(delay)
+
+            now = time.time()
+            timestamp = int(100 * (now - start))
+
+            try:
+
+                if sendaudio:
+                    k = sample % len(audio)
+                    block = looped[k:k+emulator.audioblock]
+                    raw, next_sample, next_index = encodePCMToADPCM(block, pre_sample, index)
+                    contents = struct.pack('<III', timestamp, sample, 0) + b'\0' + \
+                        struct.pack('<I', len(raw)) + raw + struct.pack('<hB', pre_sample, index)
+                    emulator.audioSendTimes[timestamp] = now
+                    self.send(AUDIO, contents, 'V')
+                    pre_sample, index = next_sample, next_index
+                    sample += len(block)
+
+                else:
+                    jpeg = emulator.videoframes[frame % len(emulator.videoframes)]
+                    contents = struct.pack('<II', timestamp, frame) + b'\0' + \
+                        struct.pack('<I', len(jpeg)) + jpeg
+                    emulator.videoSendTimes[timestamp] = now
+                    self.send(VIDEO, contents, 'V')
+                    frame += 1
+
+            except socket.error:
+                break
+
+        self.close()
+
+# Receives a whole message, returning its header and contents, or (None, None)
+# if the connection has closed
+def _receiveMessage(sock):
+
+    header = _receiveExactly(sock, HEADER_SIZE)
+    if header is None:
+        return None, None
+
+    contents = _receiveExactly(sock, struct.unpack_from('<I', header, 15)[0])
+    if contents is None:
+        return None, None
+
+    return header, contents
+
+def _receiveExactly(sock, count):
+    buf = bytearray()
+    while len(buf) < count:
+        data = sock.recv(count - len(buf))
+        if not data:
+            return None
+        buf.extend(data)
+    return bytes(buf)
+
+def _startThread(target):
+    thread = threading.Thread(target=target)
+    thread.daemon = True
+    thread.start()
+
+# JPEG start/end markers around filler bytes
+def _syntheticFrame(size):
+    return b'\xff\xd8' + bytes(bytearray(i & 0x7F for i in range(max(0, size - 4)))) + b'\xff\xd9'
+
+# One second of a sine tone
+def _tone(frequency, samplerate):
+    return [int(8000 * math.sin(2 * math.pi * frequency * i / samplerate)) for i in range(samplerate)]
+
+if __name__ == '__main__':
+
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+
+    emulator = RoverEmulator('0.0.0.0', port)
+    emulator.start()
+    print('Emulating Rover on port %d; hit CTRL-C to quit' % emulator.PORT)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.close()
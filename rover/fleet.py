@@ -0,0 +1,425 @@
+'''
+A Python class for driving many Brookstone Rovers from a single I/O thread.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import collections
+import errno
+import socket
+import threading
+import time
+
+# Python 2 needs the selectors34 backport
+try:
+    import selectors
+except ImportError:
+    import selectors34 as selectors
+
+from . import Rover20, _loginResponse
+from .commands import makeRequest, packInts, KEEPALIVE
+from .demux import Demuxer, decodeMediaFrame, COMMAND_MAGIC
+from .framequeue import FrameQueue, DROP_OLDEST
+from .replies import CommandFuture
+
+class RoverFleet(object):
+
+    def __init__(self, endpoints, roverclass=Rover20, queuesize=256):
+        ''' Creates a RoverFleet for Rovers at the specified endpoints, each a
+            (host, port) pair.  The roverclass (Rover20 or Revolution, or a
+            subclass whose constructor takes host and port) supplies the
+            commands available on each Rover.  Up to queuesize media frames
+            are held for media(); older ones are dropped when the consumer
+            falls behind.
+        '''
+        self.KEEPALIVE_PERIOD_SEC = 60
+
+        self.selector = selectors.DefaultSelector()
+
+        # Functions to run on the I/O thread, posted from other threads
+        self.calls = collections.deque()
+        self.wakeup, self.waker = socket.socketpair()
+        self.wakeup.setblocking(False)
+        self.selector.register(self.wakeup, selectors.EVENT_READ, None)
+
+        # Merged media stream of (Rover index, message ID, payload, timestamp),
+        # dropping the oldest frame rather than stall the I/O thread
+        self.mediaQueue = FrameQueue(queuesize, DROP_OLDEST)
+
+        self.connections = [_Connection(self, index, host, port)
+                            for index, (host, port) in enumerate(endpoints)]
+
+        handleclass = type('Fleet' + roverclass.__name__, (_FleetRover, roverclass),
+                           {'roverclass': roverclass})
+        self.rovers = [handleclass(connection) for connection in self.connections]
+
+        self.is_active = False
+
+    def start(self, timeout=10):
+        ''' Starts the I/O thread and waits up to timeout seconds for every
+            Rover to log in.  Raises IOError if any Rover fails to connect.
+        '''
+        self.is_active = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+        deadline = time.time() + timeout
+        for connection in self.connections:
+            if not connection.ready.wait(max(0, deadline - time.time())):
+                raise IOError('Timed out connecting to %s:%d' % (connection.host, connection.port))
+            if connection.error:
+                raise IOError('Failed to connect to %s:%d: %s' %
+                              (connection.host, connection.port, connection.error))
+
+    def run(self):
+        ''' Runs the I/O loop on the calling thread until close() is called.
+            Use start() instead to run it on a background thread.
+        '''
+        self.is_active = True
+
+        for connection in self.connections:
+            connection.connect()
+
+        while self.is_active:
+
+            # Wait for I/O or the next keep-alive message
+            now = time.time()
+            nextdue = min([c.keepaliveTime for c in self.connections if c.loggedIn] or [now + 1])
+            for key, events in self.selector.select(max(0, nextdue - now)):
+                if key.data is None:
+                    self._runCalls()
+                else:
+                    key.data.handle(events)
+
+            now = time.time()
+            for connection in self.connections:
+                if connection.loggedIn and connection.keepaliveTime <= now:
+                    connection.keepalive(now)
+
+        for connection in self.connections:
+            connection.shutdown()
+        self.selector.close()
+
+    def close(self):
+        ''' Closes off communication with all Rovers.
+        '''
+        for rover in self.rovers:
+            rover._stop()
+
+        self.is_active = False
+        self._post(lambda: None)
+        self.mediaQueue.close()
+
+    def media(self, timeout=None):
+        ''' Returns the next (Rover index, message ID, payload, timestamp) tuple
+            from the merged media stream of all Rovers, waiting up to timeout
+            seconds (forever by default).  Message ID is demux.VIDEO or
+            demux.AUDIO.  Returns None on timeout or after close().
+        '''
+        return self.mediaQueue.get(timeout)
+
+    @property
+    def dropped(self):
+        ''' Number of media frames dropped because the consumer fell behind.
+        '''
+        return self.mediaQueue.dropped
+
+    def __getitem__(self, index):
+        ''' Returns the command handle for the Rover at the specified index.
+        '''
+        return self.rovers[index]
+
+    def __len__(self):
+        return len(self.rovers)
+
+    def __iter__(self):
+        return iter(self.rovers)
+
+    def _post(self, func):
+
+        # Runs a function on the I/O thread
+        self.calls.append(func)
+        try:
+            self.waker.send(b'\0')
+        except socket.error:
+            pass
+
+    def _runCalls(self):
+        try:
+            while self.wakeup.recv(4096):
+                pass
+        except socket.error:
+            pass
+        while self.calls:
+            self.calls.popleft()()
+
+# One Rover's command and media sockets, driven by the fleet's I/O thread
+class _Connection(object):
+
+    def __init__(self, fleet, index, host, port):
+
+        self.fleet = fleet
+        self.index = index
+        self.host = host
+        self.port = port
+
+        self.ready = threading.Event()
+        self.loggedIn = False
+        self.error = None
+        self.keepaliveTime = 0
+
+        self.command = _Channel(self, self._onReplies, Demuxer(COMMAND_MAGIC, 1024))
+        self.media = None
+
+        # Expected replies, by reply ID, oldest first: (function to call with
+        # reply, function to call with error if the connection fails).  A
+        # function returning False passes the reply on to the next in line.
+        self.replies = collections.defaultdict(collections.deque)
+
+    def connect(self):
+
+        self.command.connect()
+
+        # Send login request with four arbitrary numbers
+        self.sendCommand(0, 16, packInts([0, 0, 0, 0]))
+        self.expect(1, self._onLoginReply)
+
+    def sendCommand(self, id, n, contents):
+        self.command.send(makeRequest('O', id, n, contents))
+
+    def expect(self, replyid, onreply, onerror=None):
+        if self.error:
+            if onerror:
+                onerror(self.error)
+        else:
+            self.replies[replyid].append((onreply, onerror))
+
+    def forget(self, replyid, onreply):
+        waiting = self.replies.get(replyid, ())
+        for entry in waiting:
+            if entry[0] == onreply:
+                waiting.remove(entry)
+                break
+
+    def keepalive(self, now):
+        self.command.send(KEEPALIVE)
+        self.keepaliveTime = now + self.fleet.KEEPALIVE_PERIOD_SEC
+
+    def fail(self, error):
+        if not self.error:
+            self.error = error
+        self.shutdown()
+        self.ready.set()
+
+        # Fail requests still waiting for replies
+        for waiting in self.replies.values():
+            for onreply, onerror in waiting:
+                if onerror:
+                    onerror(self.error)
+        self.replies.clear()
+
+    def shutdown(self):
+        self.loggedIn = False
+        for channel in (self.command, self.media):
+            if channel:
+                channel.close()
+
+    def _onReplies(self, demux):
+
+        # Hand each reply to the oldest request expecting its ID
+        for msgid, message in demux:
+            waiting = self.replies.get(msgid)
+            reply = message.tobytes()
+            while waiting:
+                onreply, onerror = waiting.popleft()
+                if onreply(reply) is not False:
+                    break
+
+    def _onLoginReply(self, reply):
+
+        # Send encrypted reply to Rover, ignoring its reply
+        self.sendCommand(2, 16, packInts(_loginResponse(reply)))
+        self.expect(3, lambda reply: None)
+
+        # Send video-start request
+        self.sendCommand(4, 4, packInts([1]))
+        self.expect(5, self._onVideoReply)
+
+    def _onVideoReply(self, reply):
+
+        # Open media socket and send video-start request based on last four
+        # bytes of reply
+        self.media = _Channel(self, self._onMediaFrames, Demuxer())
+        self.media.connect()
+        self.media.send(makeRequest('V', 0, 4, bytearray(reply[25:])))
+
+        # Send audio-start request
+        self.sendCommand(8, 1, [1])
+        self.expect(9, self._onAudioReply)
+
+    def _onAudioReply(self, reply):
+        self.loggedIn = True
+        self.keepalive(time.time())
+        self.ready.set()
+
+    def _onMediaFrames(self, demux):
+        for msgid, frame in demux:
+
+            # Skip stray messages and corrupt frames
+            try:
+                payload, timestamp = decodeMediaFrame(msgid, frame)
+            except ValueError:
+                continue
+
+            self.fleet.mediaQueue.put((self.index, msgid, payload, timestamp))
+
+# A non-blocking socket registered with the fleet's selector
+class _Channel(object):
+
+    def __init__(self, connection, onbytes, demux=None):
+
+        self.connection = connection
+        self.selector = connection.fleet.selector
+
+        # Called with bytes received, or with the demuxer they were received into
+        self.onbytes = onbytes
+        self.demux = demux
+
+        self.sock = socket.socket()
+        self.sock.setblocking(False)
+        self.outbuf = bytearray()
+        self.connecting = True
+        self.closed = False
+
+    def connect(self):
+        err = self.sock.connect_ex((self.connection.host, self.connection.port))
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, 'WSAEWOULDBLOCK', -1)):
+            self.connection.fail(errno.errorcode.get(err, err))
+            return
+        self.selector.register(self.sock, selectors.EVENT_WRITE, self)
+
+    def send(self, data):
+        if self.closed:
+            return
+        self.outbuf.extend(data)
+        if not self.connecting:
+            self._flush()
+
+    def handle(self, events):
+
+        if self.closed:
+            return
+
+        try:
+
+            if events & selectors.EVENT_WRITE:
+                if self.connecting:
+                    err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if err:
+                        self.connection.fail(errno.errorcode.get(err, err))
+                        return
+                    self.connecting = False
+                self._flush()
+
+            if events & selectors.EVENT_READ:
+                if self.demux:
+                    n = self.demux.recvFrom(self.sock)
+                else:
+                    data = self.sock.recv(4096)
+                    n = len(data)
+                if not n:
+                    self.connection.fail('connection closed')
+                    return
+                self.onbytes(self.demux or data)
+
+        except socket.error as e:
+            if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self.connection.fail(str(e))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.selector.unregister(self.sock)
+            except (KeyError, ValueError):
+                pass
+            self.sock.close()
+
+    def _flush(self):
+        while self.outbuf:
+            try:
+                n = self.sock.send(self.outbuf)
+            except socket.error as e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                self.connection.fail(str(e))
+                return
+            del self.outbuf[:n]
+        self._register()
+
+    def _register(self):
+        events = selectors.EVENT_READ
+        if self.outbuf:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(self.sock, events, self)
+
+# Command handle for one Rover in a fleet, sending through the fleet's I/O thread
+class _FleetRover(object):
+
+    def __init__(self, connection):
+
+        self.connection = connection
+        self.fleet = connection.fleet
+
+        # Builds treads, cameras, etc. for the Rover class; _connect() is a no-op
+        self.roverclass.__init__(self, connection.host, connection.port)
+
+    def close(self):
+        ''' Closes off communication with this Rover.
+        '''
+        self._stop()
+
+        # Also fails any requests still waiting, and any made later
+        self.fleet._post(lambda: self.connection.fail('Connection to Rover closed'))
+
+    def _stop(self):
+
+        self.telemetry.close()
+
+        # Stop moving treads, as Rover20.close() does
+        if isinstance(self, Rover20):
+            self.setTreads(0, 0)
+            self.stopTreadControl()
+
+    def _connect(self):
+        pass
+
+    def _sendCommandPacket(self, packet):
+        self.fleet._post(lambda: self.connection.command.send(packet))
+
+    def _requestReply(self, packet, replyid, convert=None):
+
+        future = CommandFuture(convert)
+
+        def request():
+            self.connection.expect(replyid, future._set, future._fail)
+            self.connection.command.send(packet)
+
+        self.fleet._post(request)
+
+        # On timeout, stop expecting the reply on the I/O thread
+        future.canceller = lambda future: \
+            self.fleet._post(lambda: self.connection.forget(replyid, future._set))
+
+        return future
@@ -0,0 +1,107 @@
+'''
+A Python class for passing media frames from the thread reading them to the
+thread processing them, through a bounded queue.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import collections
+import threading
+import time
+
+# What put() does when the queue is full
+DROP_OLDEST = 'drop-oldest'     # discard the oldest frame to make room
+LATEST      = 'latest'          # discard every waiting frame; keep only the new one
+BLOCK       = 'block'           # wait for the consumer to make room
+
+class FrameQueue(object):
+
+    def __init__(self, maxsize=1, policy=LATEST):
+        ''' Creates a FrameQueue holding up to maxsize frames, using the
+            specified policy (DROP_OLDEST, LATEST, or BLOCK) when full.
+        '''
+        if policy not in (DROP_OLDEST, LATEST, BLOCK):
+            raise ValueError('Unknown frame queue policy: %s' % policy)
+
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+
+        # Number of frames discarded because the consumer fell behind
+        self.dropped = 0
+
+        self.frames = collections.deque()
+        self.cond = threading.Condition()
+        self.closed = False
+
+    def put(self, frame):
+        ''' Adds a frame, applying the queue's policy if it is full.  Returns
+            False if the queue has been closed.
+        '''
+        with self.cond:
+
+            if self.policy == LATEST:
+                self.dropped += len(self.frames)
+                self.frames.clear()
+
+            elif self.policy == BLOCK:
+                while len(self.frames) >= self.maxsize and not self.closed:
+                    self.cond.wait()
+
+            elif len(self.frames) >= self.maxsize:
+                self.frames.popleft()
+                self.dropped += 1
+
+            if self.closed:
+                return False
+
+            self.frames.append(frame)
+            self.cond.notify_all()
+
+            return True
+
+    def get(self, timeout=None):
+        ''' Removes and returns the oldest frame, waiting up to timeout seconds
+            (forever by default) for one to arrive.  Returns None on timeout or
+            once the queue has been closed.
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+
+        with self.cond:
+
+            while not self.frames and not self.closed:
+                if deadline is None:
+                    self.cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    self.cond.wait(remaining)
+
+            if self.closed:
+                return None
+
+            frame = self.frames.popleft()
+            self.cond.notify_all()
+
+            return frame
+
+    def close(self):
+        ''' Discards any waiting frames and wakes up all producers and consumers.
+        '''
+        with self.cond:
+            self.closed = True
+            self.frames.clear()
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.frames)
@@ -0,0 +1,242 @@
+'''
+A Python class for controlling a Rover from a game controller, mapping its
+axes and buttons to Rover methods and acting on PyGame joystick events as they
+arrive, independently of the video stream.  Requires PyGame.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import sys
+import threading
+import time
+import traceback
+
+import pygame
+
+def direction(value):
+    ''' Converts an axis value to a direction: +1, -1, or 0.
+    '''
+    return 1 if value > 0 else -1 if value < 0 else 0
+
+class JoystickInput(object):
+
+    def __init__(self, index=0, deadzone=0.01, debounce=0.5):
+        ''' Creates a JoystickInput for the PyGame joystick with the specified
+            index.  Axis values within deadzone of zero count as zero, and
+            presses of a button less than debounce seconds after its last
+            press are ignored.
+        '''
+        self.index = index
+        self.deadzone = deadzone
+        self.debounce = debounce
+
+        pygame.display.init()
+        pygame.joystick.init()
+        self.controller = pygame.joystick.Joystick(index)
+        self.controller.init()
+
+        # Current values, with the dead zone applied
+        self.axisValues = {}
+        self.buttonsDown = set()
+
+        # Bindings, by axis or button
+        self.axisBindings = {}
+        self.buttonBindings = {}
+
+        # When each button was last pressed
+        self.pressTimes = {}
+
+        self.is_active = False
+
+    def mapAxes(self, axes, function, transform=None):
+        ''' Calls function() with the values of the specified axes, in order,
+            whenever any of them changes, after passing each value through
+            transform() if specified.  For example, mapAxes((1, 3),
+            rover.setTreads, lambda value: -value).
+        '''
+        self._bindAxes(axes, _AxesBinding(self, axes, function, transform))
+
+    def mapButton(self, button, onpress, onrelease=None):
+        ''' Calls onpress() when the specified button is pressed, and
+            onrelease() (if specified) when it is released.
+        '''
+        self._bindButtons([button], _ButtonBinding(onpress, onrelease))
+
+    def mapToggle(self, button, on, off):
+        ''' Calls on() and off() on alternate presses of the specified button,
+            starting with on().  For example, mapToggle(3, rover.turnLightsOn,
+            rover.turnLightsOff).
+        '''
+        self._bindButtons([button], _ToggleBinding(on, off))
+
+    def mapButtonPair(self, plusbutton, minusbutton, function):
+        ''' Calls function() with +1 while the first button is held, -1 while
+            the second is held, and 0 when neither is, whenever that changes.
+            For example, mapButtonPair(0, 2, rover.moveCameraVertical).
+        '''
+        self._bindButtons([plusbutton, minusbutton],
+                          _ButtonPairBinding(self, plusbutton, minusbutton, function))
+
+    def start(self):
+        ''' Starts handling events on a background thread.
+        '''
+        self.is_active = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        ''' Handles events on the calling thread until close() is called or
+            PyGame quits.  Use start() instead to run on a background thread.
+        '''
+        self.is_active = True
+
+        while self.is_active:
+
+            event = pygame.event.wait()
+
+            if event.type == pygame.QUIT:
+                break
+
+            try:
+                self._handle(event)
+            except Exception:
+                sys.stderr.write(traceback.format_exc())
+
+        self.is_active = False
+
+    def close(self):
+        ''' Stops handling events.
+        '''
+        self.is_active = False
+
+        # Wake the event loop
+        pygame.event.post(pygame.event.Event(pygame.USEREVENT))
+
+    def _bindAxes(self, axes, binding):
+        for axis in axes:
+            self.axisValues.setdefault(axis, 0)
+            self.axisBindings.setdefault(axis, []).append(binding)
+
+    def _bindButtons(self, buttons, binding):
+        for button in buttons:
+            self.buttonBindings.setdefault(button, []).append(binding)
+
+    def _handle(self, event):
+
+        if getattr(event, 'joy', self.index) != self.index:
+            return
+
+        if event.type == pygame.JOYAXISMOTION:
+
+            value = event.value if abs(event.value) > self.deadzone else 0
+            if self.axisValues.get(event.axis) != value:
+                self.axisValues[event.axis] = value
+                for binding in self.axisBindings.get(event.axis, ()):
+                    binding.update()
+
+        elif event.type == pygame.JOYBUTTONDOWN:
+
+            now = time.time()
+            if now - self.pressTimes.get(event.button, 0) < self.debounce:
+                return
+            self.pressTimes[event.button] = now
+
+            self.buttonsDown.add(event.button)
+            for binding in self.buttonBindings.get(event.button, ()):
+                binding.press(event.button)
+
+        elif event.type == pygame.JOYBUTTONUP:
+
+            # Ignore releases of presses ignored by debouncing
+            if event.button not in self.buttonsDown:
+                return
+
+            self.buttonsDown.discard(event.button)
+            for binding in self.buttonBindings.get(event.button, ()):
+                binding.release(event.button)
+
+# Calls a function with the values of several axes when they change
+class _AxesBinding(object):
+
+    def __init__(self, joystick, axes, function, transform):
+
+        self.joystick = joystick
+        self.axes = axes
+        self.function = function
+        self.transform = transform or (lambda value: value)
+
+        self.args = None
+
+    def update(self):
+
+        args = tuple(self.transform(self.joystick.axisValues[axis]) for axis in self.axes)
+
+        if args != self.args:
+            self.args = args
+            self.function(*args)
+
+class _ButtonBinding(object):
+
+    def __init__(self, onpress, onrelease):
+
+        self.onpress = onpress
+        self.onrelease = onrelease
+
+    def press(self, button):
+        self.onpress()
+
+    def release(self, button):
+        if self.onrelease:
+            self.onrelease()
+
+class _ToggleBinding(object):
+
+    def __init__(self, on, off):
+
+        self.on = on
+        self.off = off
+        self.isOn = False
+
+    def press(self, button):
+        self.isOn = not self.isOn
+        (self.on if self.isOn else self.off)()
+
+    def release(self, button):
+        pass
+
+class _ButtonPairBinding(object):
+
+    def __init__(self, joystick, plusbutton, minusbutton, function):
+
+        self.joystick = joystick
+        self.plusbutton = plusbutton
+        self.minusbutton = minusbutton
+        self.function = function
+
+        self.value = 0
+
+    def press(self, button):
+        self._update()
+
+    def release(self, button):
+        self._update()
+
+    def _update(self):
+
+        down = self.joystick.buttonsDown
+        value = (self.plusbutton in down) - (self.minusbutton in down)
+
+        if value != self.value:
+            self.value = value
+            self.function(value)
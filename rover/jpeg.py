@@ -0,0 +1,142 @@
+'''
+Python functions and classes for decoding the JPEG images streamed by the Rover
+2.0 in memory, using OpenCV (cv2) if it is installed and PIL otherwise.  Images
+are NumPy arrays of height x width x 3 bytes, in OpenCV's blue-green-red order.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import io
+import threading
+
+from .framequeue import FrameQueue, LATEST
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Name of the decoder in use, or None if neither is installed
+if cv2 and numpy is not None:
+    DECODER = 'cv2'
+elif Image and numpy is not None:
+    DECODER = 'PIL'
+else:
+    DECODER = None
+
+def decodeJPEG(jpegbytes):
+    ''' Decodes the specified JPEG bytes and returns the image.  Raises
+        ValueError if the bytes are not a valid JPEG image, or ImportError if
+        neither OpenCV nor PIL (with NumPy) is installed.
+    '''
+    if DECODER == 'cv2':
+        image = cv2.imdecode(numpy.frombuffer(jpegbytes, numpy.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError('Invalid JPEG image')
+        return image
+
+    if DECODER == 'PIL':
+        try:
+            image = Image.open(io.BytesIO(jpegbytes)).convert('RGB')
+        except IOError as e:
+            raise ValueError('Invalid JPEG image: %s' % e)
+        return numpy.asarray(image)[:, :, ::-1]
+
+    raise ImportError('Decoding JPEG requires OpenCV (cv2) or PIL, with NumPy')
+
+class JPEGDecoder(object):
+
+    def __init__(self):
+        ''' Creates a JPEGDecoder that decodes the images passed to put() on a
+            background thread.  Only the newest image is kept: images arriving
+            while one is being decoded replace any still waiting.
+        '''
+        if not DECODER:
+            raise ImportError('Decoding JPEG requires OpenCV (cv2) or PIL, with NumPy')
+
+        self.queue = FrameQueue(1, LATEST)
+
+        # Newest (image, timestamp) decoded, and how many images have been
+        self.image = None
+        self.decoded = 0
+        self.cond = threading.Condition()
+
+        # Images that failed to decode, and the most recent error
+        self.errors = 0
+        self.lastError = None
+
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, jpegbytes, timestamp_10msec):
+        ''' Queues JPEG bytes for decoding, without waiting.  Suitable for
+            calling from processVideo().
+        '''
+        self.queue.put((jpegbytes, timestamp_10msec))
+
+    def getImage(self, timeout=None):
+        ''' Returns the newest (image, timestamp) pair not already returned,
+            waiting up to timeout seconds (forever by default) for one to be
+            decoded.  Returns None on timeout or once the decoder is closed.
+        '''
+        with self.cond:
+            if self.image is None and not self.queue.closed:
+                self.cond.wait(timeout)
+            image, self.image = self.image, None
+            return image
+
+    def close(self):
+        ''' Stops decoding and wakes up any caller of getImage().
+        '''
+        self.queue.close()
+        with self.cond:
+            self.cond.notify_all()
+
+    @property
+    def dropped(self):
+        ''' Number of images replaced by newer ones before being decoded.
+        '''
+        return self.queue.dropped
+
+    def _run(self):
+
+        while True:
+
+            frame = self.queue.get()
+            if frame is None:
+                break
+
+            jpegbytes, timestamp = frame
+
+            try:
+                image = decodeJPEG(jpegbytes)
+            except ValueError as e:
+                self.errors += 1
+                self.lastError = e
+                continue
+
+            with self.cond:
+                self.image = image, timestamp
+                self.decoded += 1
+                self.cond.notify_all()
@@ -0,0 +1,134 @@
+'''
+Python functions and classes for measuring the loudness of the Rover's audio
+block by block and detecting when it crosses a threshold.  Uses NumPy when it
+is installed.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import collections
+import math
+import operator
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Loudness of a block of PCM samples, in sample units (+/- 2^15)
+Levels = collections.namedtuple('Levels', ['rms', 'peak', 'meanabs'])
+
+# Events reported by a LevelDetector
+ABOVE = 'above'
+BELOW = 'below'
+
+def blockLevels(pcmsamples):
+    ''' Returns the Levels (RMS, peak, and mean absolute value) of a block of
+        PCM samples, such as those passed to processAudio().
+    '''
+    n = len(pcmsamples)
+    if not n:
+        return Levels(0., 0, 0.)
+
+    if numpy is not None:
+
+        # Widen so that squares and abs(-32768) don't overflow
+        if isinstance(pcmsamples, array) and pcmsamples.typecode == 'h':
+            samples = numpy.frombuffer(pcmsamples, numpy.int16).astype(numpy.int64)
+        else:
+            samples = numpy.asarray(pcmsamples, numpy.int64)
+
+        magnitudes = numpy.abs(samples)
+        return Levels(math.sqrt(numpy.dot(samples, samples) / float(n)),
+                      int(magnitudes.max()),
+                      float(magnitudes.sum()) / n)
+
+    # Without NumPy, keep the per-sample work in builtins
+    return Levels(math.sqrt(sum(map(operator.mul, pcmsamples, pcmsamples)) / float(n)),
+                  max(max(pcmsamples), -min(pcmsamples)),
+                  sum(map(abs, pcmsamples)) / float(n))
+
+class LevelDetector(object):
+
+    def __init__(self, threshold, measure='rms', release=None, holdTime=0,
+                 onevent=None):
+        ''' Creates a LevelDetector that watches the specified measure ('rms',
+            'peak', or 'meanabs') of each audio block.  An ABOVE event occurs
+            when it rises above threshold, and a BELOW event when it then falls
+            below release (default = threshold) after having been above for at
+            least holdTime seconds.  Events are passed to onevent(event, level,
+            timestamp) as they occur.
+        '''
+        if measure not in Levels._fields:
+            raise ValueError('Unknown level measure: %s' % measure)
+
+        self.threshold = threshold
+        self.measure = measure
+        self.release = threshold if release is None else release
+        self.holdTime = holdTime
+        self.onevent = onevent
+
+        # True while the level is above the threshold
+        self.isAbove = False
+        self.aboveTime = None
+
+    def update(self, levels, timestamp_10msec):
+        ''' Checks the Levels of a block with the specified timestamp, and
+            returns ABOVE, BELOW, or None if no event occurred.
+        '''
+        level = getattr(levels, self.measure)
+        event = None
+
+        if not self.isAbove:
+            if level > self.threshold:
+                self.isAbove = True
+                self.aboveTime = timestamp_10msec
+                event = ABOVE
+
+        elif level < self.release and \
+             (timestamp_10msec - self.aboveTime) / 100. >= self.holdTime:
+            self.isAbove = False
+            event = BELOW
+
+        if event and self.onevent:
+            self.onevent(event, level, timestamp_10msec)
+
+        return event
+
+class AudioAnalyzer(object):
+
+    def __init__(self, detectors=()):
+        ''' Creates an AudioAnalyzer that measures each audio block once and
+            passes the result to each of the specified LevelDetectors.
+        '''
+        self.detectors = list(detectors)
+
+        # Levels of the most recent block
+        self.levels = None
+
+    def addDetector(self, detector):
+        ''' Adds a LevelDetector, which will see each block from now on.
+        '''
+        self.detectors.append(detector)
+
+    def process(self, pcmsamples, timestamp_10msec):
+        ''' Measures a block of PCM samples and updates the detectors.  Can be
+            called directly from processAudio().  Returns the block's Levels.
+        '''
+        levels = self.levels = blockLevels(pcmsamples)
+
+        for detector in self.detectors:
+            detector.update(levels, timestamp_10msec)
+
+        return levels
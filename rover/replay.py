@@ -0,0 +1,127 @@
+'''
+Python functions for replaying a capture file through a Rover class's
+processVideo() and processAudio() methods, without a Rover.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import multiprocessing
+import time
+
+from .capture import CaptureReader
+from .commands import makeRequest
+from .demux import decodeMediaFrame, VIDEO
+from .replies import CommandFuture
+
+def replay(roverclass, filename, realtime=False, speed=1.0, workers=1,
+           start=None, stop=None, args=()):
+    ''' Replays the capture file through a new object of the specified Rover20
+        or Revolution subclass, created with the specified constructor
+        arguments but without connecting to a Rover.  Commands sent by the
+        object are ignored.  Frames are delivered as fast as possible, or at
+        the pace of their timestamps (sped up by the specified factor) if
+        realtime is True.  The optional start and stop timestamps, in 10msec
+        units, limit the replay to part of the capture.  With more than one
+        worker, the capture is split into that many consecutive parts, each
+        replayed in its own process by its own object; roverclass must then be
+        defined at module level so that it can be pickled.  Returns the number
+        of frames replayed.
+    '''
+    with CaptureReader(filename) as reader:
+        first = reader.seek(start) if start is not None else 0
+        last = reader.seek(stop) if stop is not None else len(reader)
+
+    if workers < 2:
+        return _replayRange(roverclass, filename, first, last, realtime, speed, args)
+
+    # Split into consecutive parts, one per worker
+    bounds = [first + (last - first) * k // workers for k in range(workers + 1)]
+    tasks = [(roverclass, filename, bounds[k], bounds[k+1], realtime, speed, args)
+             for k in range(workers)]
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        counts = pool.map(_replayTask, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+    return sum(counts)
+
+def offlineRover(roverclass, *args):
+    ''' Returns a new object of the specified Rover class, created with the
+        specified constructor arguments but without connecting to a Rover.
+    '''
+    # A class statement, rather than type(), also works for Python 2's classic classes
+    class ReplayRover(_OfflineRover, roverclass):
+        pass
+    ReplayRover.__name__ = 'Replay' + roverclass.__name__
+
+    return ReplayRover(*args)
+
+def _replayTask(task):
+    return _replayRange(*task)
+
+def _replayRange(roverclass, filename, first, last, realtime, speed, args):
+
+    rover = offlineRover(roverclass, *args)
+
+    count = 0
+
+    with CaptureReader(filename) as reader:
+
+        starttime = None
+
+        for msgid, timestamp, frame in reader.frames(first, last):
+
+            # Wait till frame is due
+            if realtime:
+                if starttime is None:
+                    starttime, firststamp = time.time(), timestamp
+                delay = starttime + (timestamp - firststamp) / (100. * speed) - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+            payload, timestamp = decodeMediaFrame(msgid, frame)
+            del frame
+
+            if msgid == VIDEO:
+                rover.processVideo(payload, timestamp)
+            else:
+                rover.processAudio(payload, timestamp)
+
+            count += 1
+
+    rover.close()
+
+    return count
+
+# Stands in for the network connection of a Rover class
+class _OfflineRover:
+
+    def _connect(self):
+        self.is_active = True
+
+    def close(self):
+        self.telemetry.close()
+        self.is_active = False
+
+    def _sendCommandPacket(self, packet):
+        pass
+
+    def _requestReply(self, packet, replyid, convert=None):
+
+        # Reply at once with zeros, as long as the longest reply
+        future = CommandFuture(convert)
+        future._set(makeRequest('O', replyid, 59, bytearray(59)))
+        return future
@@ -0,0 +1,172 @@
+'''
+Python classes for reading the Rover's replies to commands on a background
+thread and handing each to the caller waiting for it, so that several requests
+can be in flight at once.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import collections
+import socket
+import sys
+import threading
+import traceback
+
+from .demux import Demuxer, COMMAND_MAGIC
+
+class CommandFuture(object):
+
+    def __init__(self, convert=None):
+        ''' Creates a CommandFuture for a reply that has not yet arrived.  If
+            specified, convert(reply) gives the result.
+        '''
+        self.convert = convert
+        self.event = threading.Event()
+        self.reply = None
+        self.error = None
+
+        # Called with this future when it is done
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+        # Called with this future on cancel() to stop expecting its reply
+        self.canceller = None
+
+    def done(self):
+        ''' Returns True if the reply has arrived, or will never arrive.
+        '''
+        return self.event.is_set()
+
+    def result(self, timeout=None):
+        ''' Waits up to timeout seconds (forever by default) for the reply and
+            returns the result.  Raises IOError on timeout, in which case the
+            request is cancelled, or if the connection closed before the reply
+            arrived.
+        '''
+        if not self.event.wait(timeout) and self.cancel():
+            raise IOError('Timed out waiting for reply from Rover')
+        if self.error:
+            raise IOError(self.error)
+        return self.convert(self.reply) if self.convert else self.reply
+
+    def cancel(self):
+        ''' Stops waiting for the reply, so that it can't be taken for the
+            reply to a later request.  Returns False if the future was already
+            done.
+        '''
+        if not self._fail('Request cancelled'):
+            return False
+        if self.canceller:
+            self.canceller(self)
+        return True
+
+    def addCallback(self, function):
+        ''' Arranges for function(future) to be called, on the thread that
+            reads the reply, once the reply has arrived or will never arrive.
+            Calls it at once if that has already happened.
+        '''
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(function)
+                return
+        self._call(function)
+
+    # Return False if the future was already done
+    def _set(self, reply):
+        return self._finish(reply, None)
+
+    def _fail(self, error):
+        return self._finish(None, error)
+
+    def _finish(self, reply, error):
+        with self.lock:
+            if self.event.is_set():
+                return False
+            self.reply = reply
+            self.error = error
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for function in callbacks:
+            self._call(function)
+        return True
+
+    # Keeps a failing callback from killing the thread that reads replies
+    def _call(self, function):
+        try:
+            function(self)
+        except Exception:
+            sys.stderr.write(traceback.format_exc())
+
+class CommandReader(object):
+
+    def __init__(self, sock):
+        ''' Creates a CommandReader that reads replies from the specified
+            command socket on a background thread until it closes.
+        '''
+        self.sock = sock
+
+        # Futures waiting for replies, by reply ID, oldest first
+        self.pending = collections.defaultdict(collections.deque)
+        self.lock = threading.Lock()
+        self.error = None
+
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def expect(self, replyid, future):
+        ''' Arranges for the next reply with the specified message ID to be
+            passed to the future.  Call before sending the request.
+        '''
+        with self.lock:
+            if self.error:
+                future._fail(self.error)
+            else:
+                self.pending[replyid].append(future)
+                future.canceller = lambda future: self._forget(replyid, future)
+
+    def _forget(self, replyid, future):
+        with self.lock:
+            try:
+                self.pending[replyid].remove(future)
+            except ValueError:
+                pass
+
+    def _run(self):
+
+        # Splits reply bytes into whole messages
+        demux = Demuxer(COMMAND_MAGIC, 1024)
+
+        try:
+            while demux.recvFrom(self.sock):
+                for msgid, message in demux:
+                    reply = message.tobytes()
+
+                    # Skip any futures already done, e.g. cancelled
+                    while True:
+                        with self.lock:
+                            waiting = self.pending.get(msgid)
+                            future = waiting.popleft() if waiting else None
+                        if not future or future._set(reply):
+                            break
+            error = 'Connection to Rover closed'
+        except (socket.error, ValueError) as e:
+            error = str(e)
+
+        # Fail any requests still waiting
+        with self.lock:
+            self.error = error
+            for waiting in self.pending.values():
+                for future in waiting:
+                    future._fail(error)
+            self.pending.clear()
@@ -0,0 +1,200 @@
+'''
+A Python class for running periodic work, such as keep-alive messages and
+status polling, for any number of Rovers on a single thread.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import itertools
+import os
+import sys
+import threading
+import time
+import traceback
+
+# Unaffected by changes to the system clock where available (Python 3)
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    monotonic = time.time
+
+class Scheduler(object):
+
+    def __init__(self):
+        ''' Creates a Scheduler, whose thread starts when the first task is
+            scheduled.  Tasks run one at a time on that thread, so they should
+            not block for long.
+        '''
+        # Tasks by due time, each knowing its index for removal
+        self.heap = []
+        self.cond = threading.Condition()
+
+        # Breaks ties in due time, first scheduled first
+        self.sequence = itertools.count()
+
+        self.thread = None
+        self.pid = None
+
+    def schedule(self, function, delay=0, period=None):
+        ''' Calls function() after delay seconds and then, if a period is
+            specified, every period seconds until cancelled.  Returns a
+            ScheduledTask for cancel().
+        '''
+        task = ScheduledTask(function, period)
+
+        with self.cond:
+
+            # Also restarts the thread in a child process after fork(), leaving
+            # the parent's tasks to the parent
+            if self.pid != os.getpid():
+                for waiting in self.heap:
+                    waiting.index = None
+                del self.heap[:]
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+
+            self._push(task, monotonic() + delay)
+
+        return task
+
+    def cancel(self, task):
+        ''' Stops a task from running again.  Safe to call more than once, and
+            from within the task itself.  Returns True if the task was waiting
+            to run.
+        '''
+        with self.cond:
+
+            task.cancelled = True
+
+            if task.index is None:
+                return False
+
+            self._remove(task.index)
+            self.cond.notify()
+            return True
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _run(self):
+
+        while True:
+
+            # Wait for the earliest task to fall due
+            with self.cond:
+                while True:
+                    delay = self.heap[0].due - monotonic() if self.heap else None
+                    if delay is not None and delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                task = self.heap[0]
+                self._remove(0)
+
+            try:
+                task.function()
+            except Exception:
+                sys.stderr.write(traceback.format_exc())
+
+            # Reschedule at a fixed rate, skipping any periods missed
+            if task.period is not None:
+                with self.cond:
+                    if not task.cancelled:
+                        self._push(task, max(task.due + task.period, monotonic()))
+
+    def _push(self, task, due):
+
+        task.due = due
+        task.order = next(self.sequence)
+        task.index = len(self.heap)
+        self.heap.append(task)
+        self._siftUp(task.index)
+
+        # Wake the thread if this task is now first
+        if task.index == 0:
+            self.cond.notify()
+
+    def _remove(self, index):
+
+        heap = self.heap
+        heap[index].index = None
+
+        last = heap.pop()
+        if index < len(heap):
+            heap[index] = last
+            last.index = index
+            self._siftDown(self._siftUp(index))
+
+    def _siftUp(self, index):
+
+        heap = self.heap
+        task = heap[index]
+
+        while index > 0:
+            parent = (index - 1) >> 1
+            if not task._before(heap[parent]):
+                break
+            heap[index] = heap[parent]
+            heap[index].index = index
+            index = parent
+
+        heap[index] = task
+        task.index = index
+        return index
+
+    def _siftDown(self, index):
+
+        heap = self.heap
+        task = heap[index]
+        size = len(heap)
+
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child+1]._before(heap[child]):
+                child += 1
+            if not heap[child]._before(task):
+                break
+            heap[index] = heap[child]
+            heap[index].index = index
+            index = child
+
+        heap[index] = task
+        task.index = index
+
+class ScheduledTask(object):
+
+    def __init__(self, function, period):
+        ''' Created by Scheduler.schedule().
+        '''
+        self.function = function
+        self.period = period
+        self.cancelled = False
+
+        # Position in the Scheduler's heap, or None when not waiting
+        self.index = None
+        self.due = None
+        self.order = None
+
+    def _before(self, other):
+        return (self.due, self.order) < (other.due, other.order)
+
+# Shared by every Rover in the process
+_shared = Scheduler()
+
+def sharedScheduler():
+    ''' Returns the Scheduler shared by every Rover in this process.
+    '''
+    return _shared
@@ -0,0 +1,260 @@
+'''
+Python classes for streaming media from the Rover to files, pipes, and other
+programs without letting a slow consumer hold up the Rover.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import collections
+import os
+import subprocess
+import sys
+import threading
+import wave
+from array import array
+
+class StreamSink(object):
+
+    def __init__(self, target, maxbytes=1048576, block=False):
+        ''' Creates a StreamSink that writes a byte stream, such as the
+            Revolution's H.264 video, to the specified target on a background
+            thread.  The target can be a writable binary file object (e.g., a
+            pipe), the name of a file or FIFO to open, or a command (a list of
+            program and arguments) to run with the stream on its standard
+            input; the process is then available as the process attribute.
+            Up to maxbytes are buffered for a slow target; beyond that, write()
+            drops data, or waits for room if block is True.
+        '''
+        self.maxbytes = maxbytes
+        self.block = block
+
+        self.process = None
+        self.file = None
+
+        if isinstance(target, (list, tuple)):
+            self.process = subprocess.Popen(target, stdin=subprocess.PIPE)
+            self.file = self.process.stdin
+        elif hasattr(target, 'write'):
+            self.file = target
+
+        # Opening a FIFO waits for its reader, so do it on the writer thread
+        self.filename = None if self.file else target
+
+        self.chunks = collections.deque()
+        self.buffered = 0
+        self.cond = threading.Condition()
+
+        # Bytes dropped because the target fell behind, and the error that
+        # stopped the stream, if any
+        self.dropped = 0
+        self.error = None
+
+        self.is_active = True
+
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write(self, data):
+        ''' Queues bytes for writing.  Returns False if they were dropped, or
+            if the sink has stopped because it was closed or its target failed.
+        '''
+        with self.cond:
+
+            if self.block:
+                while self.is_active and self.buffered and \
+                      self.buffered + len(data) > self.maxbytes:
+                    self.cond.wait()
+
+            if not self.is_active:
+                return False
+
+            if self.buffered and self.buffered + len(data) > self.maxbytes:
+                self.dropped += len(data)
+                return False
+
+            self.chunks.append(bytes(data))
+            self.buffered += len(data)
+            self.cond.notify_all()
+
+            return True
+
+    def close(self, timeout=5):
+        ''' Waits up to timeout seconds for buffered bytes to be written, then
+            closes the target.  A command's process is left to finish reading.
+        '''
+        with self.cond:
+            if self.is_active:
+                self.is_active = False
+                self.cond.notify_all()
+
+        self.thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+
+        try:
+
+            if self.filename:
+                self.file = open(self.filename, 'wb')
+
+            while True:
+
+                with self.cond:
+                    while self.is_active and not self.chunks:
+                        self.cond.wait()
+                    if not self.chunks:
+                        break
+                    data = b''.join(self.chunks)
+                    self.chunks.clear()
+
+                self.file.write(data)
+                self.file.flush()
+
+                with self.cond:
+                    self.buffered -= len(data)
+                    self.cond.notify_all()
+
+        except (IOError, OSError, ValueError) as e:
+            self.error = e
+
+        with self.cond:
+            self.is_active = False
+            self.chunks.clear()
+            self.buffered = 0
+            self.cond.notify_all()
+
+        try:
+            if self.file:
+                self.file.close()
+        except (IOError, OSError):
+            pass
+
+class AudioSink(object):
+
+    def __init__(self, filename, samplerate=8192, wav=None, batchsize=8192,
+                 maxbytes=None, maxseconds=None):
+        ''' Creates an AudioSink that saves blocks of PCM samples to the
+            specified file as 16-bit little-endian mono audio: a WAV file if wav
+            is True, or if wav is None and the filename ends in .wav; raw
+            samples otherwise.  Samples are written batchsize at a time.  If
+            maxbytes or maxseconds is given, a new file is started whenever the
+            current one would grow beyond it; the files are then named by
+            replacing a %d in filename with 1, 2, ..., or by adding -001,
+            -002, ... before the extension.
+        '''
+        self.samplerate = samplerate
+        self.wav = filename.lower().endswith('.wav') if wav is None else wav
+        self.batchsize = batchsize
+
+        # Maximum samples per file
+        limits = [maxbytes // 2 if maxbytes else None,
+                  int(maxseconds * samplerate) if maxseconds else None]
+        limits = [limit for limit in limits if limit]
+        self.maxsamples = max(1, min(limits)) if limits else None
+
+        if self.maxsamples and '%' not in filename:
+            base, ext = os.path.splitext(filename)
+            filename = base + '-%03d' + ext
+        self.filename = filename
+
+        # Names of the files written so far
+        self.filenames = []
+
+        self.batch = array('h')
+        self.lock = threading.Lock()
+        self.file = None
+
+        self._open()
+
+    def write(self, pcmsamples):
+        ''' Adds a block of PCM samples, such as those passed to processAudio().
+        '''
+        with self.lock:
+
+            if not self.file:
+                return
+
+            self.batch.extend(pcmsamples)
+
+            if len(self.batch) >= self.batchsize:
+                self._flush()
+
+    def close(self):
+        ''' Writes any remaining samples, completes the file's header, and
+            closes it.
+        '''
+        with self.lock:
+            if self.file:
+                self._flush()
+                self.file.close()
+                self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self):
+
+        filename = self.filename
+        if self.maxsamples:
+            filename %= len(self.filenames) + 1
+
+        if self.wav:
+            self.file = wave.open(filename, 'wb')
+            self.file.setnchannels(1)
+            self.file.setsampwidth(2)
+            self.file.setframerate(self.samplerate)
+        else:
+            self.file = open(filename, 'wb')
+
+        self.filenames.append(filename)
+        self.samples = 0
+
+    def _flush(self):
+
+        batch = self.batch
+        self.batch = array('h')
+
+        start = 0
+        while start < len(batch):
+
+            # Start a new file when this one is full
+            count = len(batch) - start
+            if self.maxsamples:
+                if self.samples >= self.maxsamples:
+                    self.file.close()
+                    self._open()
+                count = min(count, self.maxsamples - self.samples)
+
+            self._writeSamples(batch[start:start+count])
+            self.samples += count
+            start += count
+
+    def _writeSamples(self, samples):
+
+        if sys.byteorder == 'big':
+            samples.byteswap()
+
+        # Header is completed when the file is closed
+        if self.wav:
+            self.file.writeframesraw(samples.tostring() if sys.version_info[0] < 3 else samples.tobytes())
+        else:
+            samples.tofile(self.file)
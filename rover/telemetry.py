@@ -0,0 +1,139 @@
+'''
+A Python class for polling the Rover's status in the background and caching
+the latest readings.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import collections
+import threading
+import time
+
+from .scheduler import sharedScheduler
+
+# A cached value and the time it was read
+Reading = collections.namedtuple('Reading', ['value', 'time'])
+
+class Telemetry(object):
+
+    def __init__(self, scheduler=None):
+        ''' Creates a Telemetry object that polls on the specified Scheduler
+            (default = the one shared by every Rover).
+        '''
+        self.scheduler = scheduler or sharedScheduler()
+
+        # Name -> _Item
+        self.items = {}
+        self.lock = threading.Lock()
+        self.is_active = True
+
+    def add(self, name, request, period, ttl=None, onchange=None):
+        ''' Polls the named item every period seconds by calling request(),
+            which must return a CommandFuture for its value (e.g.,
+            Rover20.requestBatteryPercentage).  Values older than ttl seconds
+            (default = twice the period) are considered stale.  If specified,
+            onchange(value, previous) is called on the thread that reads the
+            reply whenever a new value differs from the one before it.
+            Replaces any item with the same name.
+        '''
+        item = _Item(request, ttl or 2 * period, onchange)
+
+        with self.lock:
+            if not self.is_active:
+                return
+            self._cancel(self.items.get(name))
+            self.items[name] = item
+            item.task = self.scheduler.schedule(lambda: self._poll(item), 0, period)
+
+    def remove(self, name):
+        ''' Stops polling the named item.
+        '''
+        with self.lock:
+            self._cancel(self.items.pop(name, None))
+
+    def get(self, name, default=None):
+        ''' Returns the named item's latest value without waiting, or default
+            if it has not been read yet or is stale.
+        '''
+        item = self.items.get(name)
+        reading = item.reading if item else None
+        if not reading or time.time() - reading.time > item.ttl:
+            return default
+        return reading.value
+
+    def reading(self, name):
+        ''' Returns the named item's latest Reading (value and time), however
+            old, or None if it has not been read yet.
+        '''
+        item = self.items.get(name)
+        return item.reading if item else None
+
+    def close(self):
+        ''' Stops polling.
+        '''
+        with self.lock:
+            self.is_active = False
+            for item in self.items.values():
+                self._cancel(item)
+
+    def _cancel(self, item):
+        if item:
+            self.scheduler.cancel(item.task)
+            if item.future:
+                item.future.cancel()
+
+    def _poll(self, item):
+
+        # Give up on the last request if it is still waiting, so that a lost
+        # reply can't leave it in line for the next one
+        if item.future:
+            item.future.cancel()
+
+        # Send on the scheduler thread, but take the reply on the reader thread
+        try:
+            future = item.future = item.request()
+        except (IOError, OSError):
+            return
+        future.addCallback(lambda future: self._update(item, future))
+
+        # Don't leave a request waiting if polling stopped meanwhile
+        if item.task.cancelled:
+            future.cancel()
+
+    def _update(self, item, future):
+
+        try:
+            value = future.result(0)
+        except IOError:
+            return
+
+        previous = item.reading
+        item.reading = Reading(value, time.time())
+
+        if item.onchange and (previous is None or previous.value != value):
+            item.onchange(value, previous.value if previous else None)
+
+# A polled value
+class _Item(object):
+
+    def __init__(self, request, ttl, onchange):
+
+        self.request = request
+        self.ttl = ttl
+        self.onchange = onchange
+
+        self.reading = None
+        self.task = None
+
+        # Latest request
+        self.future = None
@@ -0,0 +1,158 @@
+'''
+A Python class for driving the Rover 2.0's treads from a fixed-rate control
+loop, so that the latest speeds set always reach the Rover promptly.
+
+Copyright (C) 2015 Simon D. Levy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+'''
+
+import collections
+import socket
+import sys
+import threading
+import traceback
+
+from .scheduler import monotonic
+
+class TreadControlLoop(object):
+
+    def __init__(self, rover, rate=20, refresh=1.0, history=100):
+        ''' Creates a TreadControlLoop that checks the speeds set for the
+            specified Rover20's treads rate times per second on its own thread,
+            sending a command for each tread whose speed has changed.  Stops
+            are sent at once.  A moving tread's command is repeated every
+            refresh seconds to keep it moving.  The latencies from setting a
+            speed to handing its command to the socket are kept, for the last
+            history commands, in latencies.
+        '''
+        self.rover = rover
+        self.period = 1. / rate
+        self.refresh = refresh
+
+        # Wheel IDs for forward motion, left then right
+        self.indices = (rover.leftTread.index, rover.rightTread.index)
+
+        # Latest speeds set, and when
+        self.speeds = [0, 0]
+        self.setTimes = [0, 0]
+
+        # Last (wheel ID, speed) commands sent, and when
+        self.commands = [(index, 0) for index in self.indices]
+        self.sendTimes = [0, 0]
+
+        # Seconds from setting each speed to handing its command to the socket
+        self.latencies = collections.deque(maxlen=history)
+        self.sent = 0
+
+        # Replace the Rover20's treads while the loop runs
+        self.treads = (_LoopTread(self, 0, self.indices[0]),
+                       _LoopTread(self, 1, self.indices[1]))
+
+        self.cond = threading.Condition()
+        self.sendLock = threading.Lock()
+        self.is_active = True
+
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def set(self, side, value):
+        ''' Sets the speed of the left (0) or right (1) tread, in [-1..+1].
+        '''
+        with self.cond:
+            self.speeds[side] = value
+            self.setTimes[side] = monotonic()
+
+        # Stops can't wait for the next tick
+        if _treadCommand(self.indices[side], value)[1] == 0:
+            self._update(side, monotonic())
+
+    def meanLatency(self):
+        ''' Returns the mean latency, in seconds, from setting a speed to
+            handing its command to the socket, over recent commands, or None if
+            none have been sent.
+        '''
+        latencies = list(self.latencies)
+        return sum(latencies) / len(latencies) if latencies else None
+
+    def close(self):
+        ''' Stops the loop, leaving the treads as they were last set.
+        '''
+        with self.cond:
+            self.is_active = False
+            self.cond.notify_all()
+
+    def _run(self):
+
+        nexttick = monotonic()
+
+        while True:
+
+            # Wait for the next tick, skipping any missed
+            with self.cond:
+                while self.is_active:
+                    delay = nexttick - monotonic()
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                if not self.is_active:
+                    return
+
+            now = monotonic()
+            nexttick = max(nexttick + self.period, now)
+
+            # Keep going after a failed send, trying again next tick
+            for side in (0, 1):
+                try:
+                    self._update(side, now)
+                except (socket.error, IOError):
+                    sys.stderr.write(traceback.format_exc())
+
+    def _update(self, side, now):
+
+        with self.sendLock:
+
+            with self.cond:
+                command = _treadCommand(self.indices[side], self.speeds[side])
+                setTime = self.setTimes[side]
+
+            changed = command != self.commands[side]
+
+            if changed or (command[1] and now - self.sendTimes[side] >= self.refresh):
+
+                self.rover._spinWheels(*command)
+
+                self.commands[side] = command
+                self.sendTimes[side] = monotonic()
+                self.sent += 1
+
+                if changed:
+                    self.latencies.append(self.sendTimes[side] - setTime)
+
+# Stands in for a Rover20's tread while the control loop runs
+class _LoopTread(object):
+
+    def __init__(self, loop, side, index):
+
+        self.loop = loop
+        self.side = side
+        self.index = index
+
+    def update(self, value):
+        self.loop.set(self.side, value)
+
+# The (wheel ID, speed) command for a tread's speed; backward is the next ID
+def _treadCommand(index, value):
+
+    speed = int(round(abs(value)*10))
+
+    return (index if value >= 0 or speed == 0 else index + 1, speed)
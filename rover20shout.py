@@ -23,6 +23,7 @@ TURNSEC     = 1.25
 FLEESEC     = 2.0
 
 from rover import Rover20
+from rover.levels import AudioAnalyzer, LevelDetector, ABOVE
 import time
 
 
@@ -30,17 +31,15 @@ import time
 class AudioRover(Rover20):
     
     def __init__(self):
-        Rover20.__init__(self)
         self.heard = False
+        self.analyzer = AudioAnalyzer([LevelDetector(NOISETHRESH, 'meanabs', onevent=self.onNoise)])
+        Rover20.__init__(self)
             
-    def processAudio(self, pcmsamples, _):
-                            
-        avg = 0
-        
-        for sample in pcmsamples:
-            avg += abs(sample)
-            
-        if avg/len(pcmsamples) > NOISETHRESH:
+    def processAudio(self, pcmsamples, timestamp_10msec):
+        self.analyzer.process(pcmsamples, timestamp_10msec)
+
+    def onNoise(self, event, level, timestamp_10msec):
+        if event == ABOVE:
             self.heard = True
            
  
@@ -48,8 +47,9 @@ class AudioRover(Rover20):
 rover = AudioRover()
 
 
-# Loop till a loud noise is heard
-while not rover.heard:
+# Wait till a loud noise is heard, waking periodically so that CTRL-C is
+# handled on Python 2
+while not rover.waitForAudioEvent(lambda pcmsamples, timestamp: rover.heard, 1):
     pass
         
 # Turn around for a specified duration